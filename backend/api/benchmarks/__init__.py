@@ -0,0 +1,17 @@
+from api.benchmarks import (endpoints,
+                            ingredients,
+                            renderers,
+                            search,
+                            server_timing,
+                            shopping_list,
+                            uploads)
+
+BENCHMARKS = {
+    'endpoints': endpoints.run,
+    'ingredients': ingredients.run,
+    'renderers': renderers.run,
+    'search': search.run,
+    'server_timing': server_timing.run,
+    'shopping_list': shopping_list.run,
+    'uploads': uploads.run,
+}
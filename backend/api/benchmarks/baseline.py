@@ -0,0 +1,48 @@
+"""Сравнение результатов бенчмарков с сохраненным эталоном."""
+
+# Метрика: (допустимый рост в долях порога, абсолютный допуск). Число
+# запросов детерминировано и не должно расти вовсе, у времени и памяти
+# абсолютный допуск отсекает шум на малых значениях. Пик памяти зависит
+# от кешей интерпретатора и между запусками колеблется на 30%, поэтому
+# ловится только рост в разы. p99 на двадцати замерах совпадает
+# с максимумом и только выводится, но не сравнивается.
+METRICS = {
+    'queries': (0, 0),
+    'p50_ms': (1, 2.0),
+    'p95_ms': (1, 2.0),
+    'memory_kb': (4, 256.0),
+}
+
+
+def compare(results, baseline, threshold, path=''):
+    """Список регрессий results относительно baseline.
+
+    Сравниваются только метрики из METRICS, присутствующие в обоих
+    словарях; size (объем набора данных) должен совпадать.
+    """
+    regressions = []
+
+    for key, expected in baseline.items():
+        if key not in results:
+            continue
+        name = f'{path}/{key}' if path else key
+        actual = results[key]
+
+        if isinstance(expected, dict) and isinstance(actual, dict):
+            regressions.extend(compare(actual, expected, threshold, name))
+        elif key == 'size' and actual != expected:
+            regressions.append(
+                f'{name}: эталон снят на {expected}, запуск на {actual}'
+            )
+        elif key in METRICS:
+            factor, tolerance = METRICS[key]
+            limit = max(
+                expected * (1 + threshold * factor), expected + tolerance
+            )
+            if actual > limit:
+                regressions.append(
+                    f'{name}: {actual:.2f} > {expected:.2f} '
+                    f'(предел {limit:.2f})'
+                )
+
+    return regressions
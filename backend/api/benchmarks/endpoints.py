@@ -0,0 +1,422 @@
+import base64
+import gc
+import itertools
+import json
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.transfer import NDJSON_CONTENT_TYPE
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+PREFIX = 'benchmark_endpoints'
+ROUNDS = 20
+MEMORY_ROUNDS = 3
+# Объем набора, на котором снят baseline.json.
+BASELINE_SIZE = 10_000
+PASSWORDS = ('Benchmark-Password-1', 'Benchmark-Password-2')
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (2, 2), 'red').save(buffer, 'PNG')
+
+    return (
+        'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+def seed(size):
+    """Синтетический набор: size записей избранного и пропорционально
+    пользователи, рецепты, подписки и корзины."""
+    if not Ingredient.objects.exists():
+        call_command('loadingredientstags', stdout=StringIO())
+
+    call_command(
+        'generate_dataset',
+        users=max(size // 100, 10),
+        recipes=max(size // 10, 100),
+        follows=size // 5,
+        favorites=size,
+        carts=size // 10,
+        prefix=PREFIX,
+        stdout=StringIO()
+    )
+
+    # Самые активные пользователь и автор: у них длиннее всего корзина
+    # и список подписчиков, на них запросы тяжелее.
+    users = User.objects.filter(username__startswith=PREFIX)
+    user = users.annotate(
+        carts=Count('shoppingcart')
+    ).order_by('-carts', 'id').first()
+    author = users.exclude(id=user.id).annotate(
+        followers=Count('following')
+    ).order_by('-followers', 'id').first()
+    admin = User.objects.create(
+        username=f'{PREFIX}_admin',
+        email=f'{PREFIX}_admin@foodgram.ru',
+        is_staff=True
+    )
+
+    return user, author, admin
+
+
+def get_cases(user, author, admin):
+    """Группы запросов: запросы группы выполняются по порядку в каждом
+    раунде, поэтому POST и DELETE одного ресурса идут парой.
+
+    Путь и тело запроса могут быть функциями - фикстурами, которые
+    вызываются перед каждым запросом вне замеров: так запросы на запись
+    каждый раз получают новые имена, пароли и токены.
+    """
+    anonymous = APIClient()
+    client = APIClient()
+    client.force_authenticate(user)
+    staff = APIClient()
+    staff.force_authenticate(admin)
+
+    recipe = Recipe.objects.filter(
+        author__username__startswith=PREFIX
+    ).order_by('id').first()
+    # Рецепт не из избранного и не из корзины пользователя для
+    # переключателей.
+    toggled = Recipe.objects.filter(
+        author__username__startswith=PREFIX
+    ).exclude(favorites__user=user).exclude(shoppingcart__user=user).first()
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    ingredient = Ingredient.objects.order_by('id').first()
+    own = Recipe.objects.filter(author=user).prefetch_related(
+        'ingredient', 'tags'
+    ).first()
+    tag = Tag.objects.order_by('id').first()
+    ingredients = list(Ingredient.objects.order_by('id')[:3])
+    numbers = itertools.count()
+    image = make_image()
+
+    # Пользователи, чьи пароль и токен меняются запросами.
+    password_user = User.objects.create_user(
+        username=f'{PREFIX}_password',
+        email=f'{PREFIX}_password@foodgram.ru',
+        password=PASSWORDS[0]
+    )
+    password_client = APIClient()
+    password_client.force_authenticate(password_user)
+    token_user = User.objects.create_user(
+        username=f'{PREFIX}_token',
+        email=f'{PREFIX}_token@foodgram.ru',
+        password=PASSWORDS[0]
+    )
+    token_client = APIClient()
+
+    def new_recipe():
+        return {
+            'name': f'{PREFIX} новый {next(numbers)}',
+            'text': 'Приготовить.',
+            'cooking_time': 10,
+            'image': image,
+            'tags': [tag.id],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 10}
+                for ingredient in ingredients
+            ],
+        }
+
+    def created_recipe():
+        created = Recipe.objects.filter(
+            author=user, name__startswith=f'{PREFIX} новый '
+        ).latest('id')
+
+        return f'/api/recipes/{created.id}/'
+
+    def new_user():
+        # Созданные ранее записи удаляются, чтобы объем данных не рос
+        # от раунда к раунду.
+        User.objects.filter(username__startswith=f'{PREFIX}_new_').delete()
+        number = next(numbers)
+
+        return {
+            'email': f'{PREFIX}_new_{number}@foodgram.ru',
+            'username': f'{PREFIX}_new_{number}',
+            'first_name': 'Иван',
+            'last_name': 'Петров',
+            'password': PASSWORDS[0],
+        }
+
+    def new_password():
+        current, new = PASSWORDS
+        if not password_user.check_password(current):
+            current, new = new, current
+
+        return {'current_password': current, 'new_password': new}
+
+    def logout():
+        token = Token.objects.get(user=token_user)
+        token_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        return '/api/auth/token/logout/'
+
+    def new_import():
+        return json.dumps({
+            'author': user.email,
+            'name': f'{PREFIX} новый {next(numbers)}',
+            'text': 'Приготовить.',
+            'cooking_time': 10,
+            'image': recipe.image.name,
+            'tags': [tag.slug],
+            'ingredients': [
+                {
+                    'name': ingredient.name,
+                    'measurement_unit': ingredient.measurement_unit,
+                    'amount': 10,
+                }
+                for ingredient in ingredients
+            ],
+        }, ensure_ascii=False).encode() + b'\n'
+
+    cases = [
+        [('ingredients list', anonymous, 'get', '/api/ingredients/')],
+        [('ingredients search', anonymous, 'get',
+          '/api/ingredients/?name=сах')],
+        [('ingredient detail', anonymous, 'get',
+          f'/api/ingredients/{ingredient.id}/')],
+        [('tags list', anonymous, 'get', '/api/tags/')],
+        [('tag detail', anonymous, 'get', f'/api/tags/{tag.id}/')],
+        # Запросы на запись меняют поколение кеша, поэтому первый
+        # анонимный запрос раунда заполняет кеш, а второй читает из него.
+        [
+            ('recipes list anonymous miss', anonymous, 'get',
+             '/api/recipes/'),
+            ('recipes list anonymous', anonymous, 'get', '/api/recipes/'),
+        ],
+        [('recipes list', client, 'get', '/api/recipes/')],
+        [('recipes list tags', client, 'get',
+          '/api/recipes/?' + '&'.join(f'tags={tag}' for tag in tags))],
+        [('recipes list author', client, 'get',
+          f'/api/recipes/?author={author.id}')],
+        [('recipes list favorited', client, 'get',
+          '/api/recipes/?is_favorited=1')],
+        [('recipes list in cart', client, 'get',
+          '/api/recipes/?is_in_shopping_cart=1')],
+        [('recipes search', client, 'get', '/api/recipes/?name=суп')],
+        [('recipes list cursor', client, 'get',
+          '/api/recipes/?pagination=cursor')],
+        [('recipe detail', client, 'get', f'/api/recipes/{recipe.id}/')],
+        [
+            ('favorite add', client, 'post',
+             f'/api/recipes/{toggled.id}/favorite/'),
+            ('favorite remove', client, 'delete',
+             f'/api/recipes/{toggled.id}/favorite/'),
+        ],
+        [
+            ('shopping cart add', client, 'post',
+             f'/api/recipes/{toggled.id}/shopping_cart/'),
+            ('shopping cart remove', client, 'delete',
+             f'/api/recipes/{toggled.id}/shopping_cart/'),
+        ],
+        [
+            ('recipe create', client, 'post', '/api/recipes/', new_recipe),
+            ('recipe delete', client, 'delete', created_recipe),
+        ],
+        [
+            ('recipes import', staff, 'post', '/api/recipes/import/',
+             new_import),
+            ('imported recipe delete', client, 'delete', created_recipe),
+        ],
+        [('download shopping cart', client, 'get',
+          '/api/recipes/download_shopping_cart/')],
+        [('download shopping cart csv', client, 'get',
+          '/api/recipes/download_shopping_cart/?format=csv')],
+        [('shopping cart summary', client, 'get',
+          '/api/recipes/shopping_cart_summary/')],
+        [('export recipes', staff, 'get', '/api/recipes/export/')],
+        [('users list', client, 'get', '/api/users/')],
+        [('user detail', client, 'get', f'/api/users/{author.id}/')],
+        [('users me', client, 'get', '/api/users/me/')],
+        [('user create', anonymous, 'post', '/api/users/', new_user)],
+        [('set password', password_client, 'post',
+          '/api/users/set_password/', new_password)],
+        [
+            ('token login', anonymous, 'post', '/api/auth/token/login/', {
+                'email': token_user.email,
+                'password': PASSWORDS[0],
+            }),
+            ('token logout', token_client, 'post', logout),
+        ],
+        [('subscriptions', client, 'get',
+          '/api/users/subscriptions/?recipes_limit=3')],
+        [
+            ('subscribe', staff, 'post',
+             f'/api/users/{author.id}/subscribe/?recipes_limit=3'),
+            ('unsubscribe', staff, 'delete',
+             f'/api/users/{author.id}/subscribe/'),
+        ],
+    ]
+    if own is not None:
+        cases.append([('recipe update', client, 'patch',
+                       f'/api/recipes/{own.id}/', {
+                           'name': own.name,
+                           'text': own.text,
+                           'cooking_time': own.cooking_time,
+                           'tags': [tag.id for tag in own.tags.all()],
+                           'ingredients': [
+                               {
+                                   'id': item.ingredient_id,
+                                   'amount': item.amount,
+                               }
+                               for item in own.ingredient.all()
+                           ],
+                       })])
+
+    return cases
+
+
+def prepare(step):
+    """Шаг с результатами фикстур вместо функций пути и тела."""
+    name, client, method, *request = step
+
+    return (
+        name,
+        client,
+        method,
+        *(value() if callable(value) else value for value in request)
+    )
+
+
+def send(name, client, method, path, data=None):
+    if method == 'get':
+        response = client.get(path)
+    elif isinstance(data, bytes):
+        response = getattr(client, method)(
+            path, data, content_type=NDJSON_CONTENT_TYPE
+        )
+    else:
+        response = getattr(client, method)(path, data, format='json')
+
+    if response.streaming:
+        b''.join(response.streaming_content)
+
+    if response.status_code >= 400:
+        raise ValueError(f'{name}: {path} вернул {response.status_code}')
+
+
+def measure(cases):
+    timings = {}
+    queries = {}
+    memory = {}
+
+    # Первый раунд прогревает кеши и индекс ингредиентов.
+    for case in cases:
+        for step in case:
+            send(*prepare(step))
+
+    for case in cases:
+        for step in case:
+            step = prepare(step)
+            with CaptureQueriesContext(connection) as context:
+                send(*step)
+            queries[step[0]] = len(context)
+
+    # Как и timeit, сборщик мусора отключается на время замеров: иначе
+    # его паузы попадают в случайные запросы и определяют p95 и p99.
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(ROUNDS):
+            for case in cases:
+                for step in case:
+                    step = prepare(step)
+                    start = time.perf_counter()
+                    send(*step)
+                    timings.setdefault(step[0], []).append(
+                        (time.perf_counter() - start) * 1000
+                    )
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        for _ in range(MEMORY_ROUNDS):
+            for case in cases:
+                for step in case:
+                    step = prepare(step)
+                    tracemalloc.reset_peak()
+                    current, _ = tracemalloc.get_traced_memory()
+                    send(*step)
+                    _, peak = tracemalloc.get_traced_memory()
+                    memory.setdefault(step[0], []).append(
+                        (peak - current) / 1024
+                    )
+    finally:
+        tracemalloc.stop()
+
+    results = {}
+    for name, values in timings.items():
+        cuts = statistics.quantiles(values, n=100, method='inclusive')
+        results[name] = {
+            'queries': queries[name],
+            'p50_ms': cuts[49],
+            'p95_ms': cuts[94],
+            'p99_ms': cuts[98],
+            'memory_kb': statistics.median(memory[name]),
+        }
+
+    return results
+
+
+def run(stdout, size=BASELINE_SIZE, **options):
+    # Набор данных создается в отдельной пустой тестовой базе: число
+    # запросов части маршрутов (например, выгрузки) зависит от количества
+    # строк, а эталон снят на чистой базе.
+    name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    # Тестовый клиент обращается к хосту testserver, картинки созданных
+    # рецептов сохраняются во временный каталог. Панель отладки
+    # (INTERNAL_IPS) в замеры не попадает: она форматирует каждый
+    # запрос к базе, а ее кеш делал время зависимым от порядка маршрутов.
+    media_root = tempfile.mkdtemp()
+    overrides = override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        INTERNAL_IPS=[],
+        MEDIA_ROOT=media_root
+    )
+    # Варианты картинок создаются в фоновых потоках вне запроса и
+    # конкурировали бы с замеряемыми запросами за тестовую базу.
+    variants = mock.patch('recipes.signals.schedule_variants')
+    try:
+        with overrides, variants:
+            start = time.perf_counter()
+            cases = get_cases(*seed(size))
+            stdout.write(
+                f'Набор данных на {size} записей избранного: '
+                f'{time.perf_counter() - start:.2f} с'
+            )
+            results = measure(cases)
+    finally:
+        connection.creation.destroy_test_db(name, verbosity=0)
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    for name, result in results.items():
+        stdout.write(
+            f'{name:<28} запросов {result["queries"]:>3} '
+            f'p50 {result["p50_ms"]:>8.2f} мс '
+            f'p95 {result["p95_ms"]:>8.2f} мс '
+            f'память {result["memory_kb"]:>9.1f} КБ'
+        )
+
+    return {'size': size, 'routes': results}
@@ -0,0 +1,60 @@
+import random
+import time
+
+from api.ingredient_index import IngredientIndex
+from recipes.models import Ingredient
+
+WORDS = [
+    'мука', 'сахар', 'соль', 'масло', 'молоко', 'ёжевика', 'яйцо',
+    'перец', 'капуста', 'морковь', 'лук', 'чеснок', 'сыр', 'творог',
+]
+UNITS = ['г', 'кг', 'мл', 'шт.', 'ст. л.']
+QUERIES = ['м', 'му', 'сах', 'еж', 'ёж', 'ор', 'сыр тв', 'zzz']
+ROUNDS = 2_000
+LIMIT = 10
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(stdout, size=100_000, **options):
+    random.seed(size)
+    rows = [
+        (
+            number,
+            f'{random.choice(WORDS)} {random.choice(WORDS)} {number}',
+            random.choice(UNITS),
+        )
+        for number in range(size)
+    ]
+    start = time.perf_counter()
+    index = IngredientIndex(rows)
+    build_ms = (time.perf_counter() - start) * 1000
+    stdout.write(f'Построение индекса на {size} строк: {build_ms:.2f} мс')
+
+    results = {'build_ms': build_ms}
+    for query in QUERIES:
+        timings = []
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            index.search(query, LIMIT)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[query] = {
+            'p50_ms': percentile(timings, 0.5),
+            'p99_ms': percentile(timings, 0.99),
+        }
+        stdout.write(
+            f'{query:<10} p50 {results[query]["p50_ms"]:.4f} мс '
+            f'p99 {results[query]["p99_ms"]:.4f} мс'
+        )
+
+    start = time.perf_counter()
+    list(Ingredient.objects.filter(name__istartswith='му')[:LIMIT])
+    results['database_ms'] = (time.perf_counter() - start) * 1000
+    stdout.write(
+        f'Запрос к базе для сравнения: {results["database_ms"]:.2f} мс'
+    )
+
+    return results
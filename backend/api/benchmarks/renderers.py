@@ -0,0 +1,78 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+PAGE_SIZE = 100
+ROUNDS = 200
+
+
+def make_recipe_page(size=PAGE_SIZE):
+    """Синтетическая страница рецептов в формате RecipeListSerializer."""
+    results = []
+    for number in range(size):
+        results.append({
+            'id': number,
+            'tags': [
+                {
+                    'id': tag,
+                    'name': f'Тег {tag}',
+                    'color': '#FFDE40',
+                    'slug': f'tag-{tag}',
+                }
+                for tag in range(3)
+            ],
+            'author': {
+                'email': f'author{number}@foodgram.ru',
+                'id': number,
+                'username': f'author{number}',
+                'first_name': 'Никола',
+                'last_name': 'Тесла',
+                'is_subscribed': bool(number % 2),
+            },
+            'ingredients': [
+                {
+                    'id': ingredient,
+                    'name': f'ингредиент {ingredient}',
+                    'measurement_unit': 'г',
+                    'amount': ingredient * 10,
+                }
+                for ingredient in range(1, 11)
+            ],
+            'is_favorited': bool(number % 3),
+            'is_in_shopping_cart': False,
+            'name': f'Рецепт {number}',
+            'image': f'http://localhost/media/recipe/images/{number}.png',
+            'text': 'Описание рецепта приготовления. ' * 20,
+            'cooking_time': 45,
+        })
+
+    return {
+        'count': 100_000,
+        'next': 'http://localhost/api/recipes/?page=2',
+        'previous': None,
+        'results': results,
+    }
+
+
+def run(stdout, rounds=ROUNDS, **options):
+    data = make_recipe_page()
+    renderers = [JSONRenderer(), FastJSONRenderer()]
+    if msgpack is not None:
+        renderers.append(MessagePackRenderer())
+
+    results = {}
+    for renderer in renderers:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            body = renderer.render(data, renderer.media_type)
+        elapsed = (time.perf_counter() - start) / rounds
+
+        name = type(renderer).__name__
+        results[name] = {'bytes': len(body), 'render_ms': elapsed * 1000}
+        stdout.write(
+            f'{name:<22} {len(body):>9} байт {elapsed * 1000:>9.3f} мс'
+        )
+
+    return results
@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.filters import RecipeSearchFilter
+from recipes.models import Recipe
+from users.models import User
+
+DISHES = [
+    'Салат', 'Суп', 'Пирог', 'Каша', 'Запеканка',
+    'Омлет', 'Рагу', 'Паста', 'Борщ', 'Плов',
+]
+INGREDIENTS = [
+    'говядиной', 'курицей', 'грибами', 'сыром', 'тыквой',
+    'картофелем', 'яблоками', 'рисом', 'фасолью', 'ёжевикой',
+]
+QUERIES = ['борщ', 'пирог с яблоками', 'гриб', 'ежевикой', 'суп курица']
+ROUNDS = 20
+BATCH_SIZE = 5_000
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(size):
+    author = User.objects.create(
+        username='benchmark_search', email='benchmark_search@foodgram.ru'
+    )
+    random.seed(size)
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author=author,
+                name=(
+                    f'{random.choice(DISHES)} с {random.choice(INGREDIENTS)}'
+                    f' №{number}'
+                ),
+                text='Benchmark',
+                image='recipe/images/benchmark.png',
+            )
+            for number in range(size)
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+
+def timed(queryset):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        ids = list(queryset.values_list('id', flat=True)[:6])
+    return (time.perf_counter() - start) / ROUNDS * 1000, len(ids)
+
+
+def run(stdout, size=100_000, **options):
+    factory = APIRequestFactory()
+    search = RecipeSearchFilter()
+    results = {}
+
+    try:
+        with transaction.atomic():
+            seed(size)
+            for query in QUERIES:
+                request = Request(
+                    factory.get('/api/recipes/', {'name': query})
+                )
+                naive_ms, _ = timed(
+                    Recipe.objects.filter(name__icontains=query)
+                )
+                indexed_ms, found = timed(search.filter_queryset(
+                    request, Recipe.objects.all(), None
+                ))
+                results[query] = {
+                    'icontains_ms': naive_ms,
+                    'search_ms': indexed_ms,
+                    'found': found,
+                }
+                stdout.write(
+                    f'{query:<20} icontains {naive_ms:>8.2f} мс '
+                    f'поиск {indexed_ms:>8.2f} мс'
+                )
+            raise Rollback
+    except Rollback:
+        pass
+
+    return results
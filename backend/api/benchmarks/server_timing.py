@@ -0,0 +1,93 @@
+import gc
+import statistics
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.benchmarks.endpoints import seed
+
+PATHS = [
+    '/api/tags/',
+    '/api/recipes/',
+    '/api/recipes/?is_favorited=1',
+    '/api/users/subscriptions/?recipes_limit=3',
+]
+ROUNDS = 200
+
+
+class Rollback(Exception):
+    pass
+
+
+def make_client(user, enabled):
+    """Клиент с цепочкой middleware, собранной при REQUEST_TIMING=enabled.
+
+    Цепочка строится при первом запросе и дальше от настроек не зависит.
+    """
+    client = APIClient()
+    client.force_authenticate(user)
+    with override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        REQUEST_TIMING=enabled,
+        REQUEST_TIMING_BUDGET_MS=10**9,
+    ):
+        client.get(PATHS[0])
+
+    return client
+
+
+def timed(client, path):
+    start = time.perf_counter()
+    client.get(path)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(stdout, size=100_000, **options):
+    results = {}
+
+    try:
+        with transaction.atomic(), override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            user, _, _ = seed(size)
+            disabled = make_client(user, False)
+            enabled = make_client(user, True)
+
+            for path in PATHS:
+                timings = {'disabled': [], 'enabled': []}
+                # Прогрев кешей, затем чередование клиентов, чтобы дрейф
+                # окружения одинаково сказывался на обоих вариантах.
+                timed(disabled, path)
+                timed(enabled, path)
+                gc.collect()
+                gc.disable()
+                try:
+                    for _ in range(ROUNDS):
+                        timings['disabled'].append(timed(disabled, path))
+                        timings['enabled'].append(timed(enabled, path))
+                finally:
+                    gc.enable()
+
+                disabled_ms = statistics.median(timings['disabled'])
+                enabled_ms = statistics.median(timings['enabled'])
+                results[path] = {
+                    'disabled_ms': disabled_ms,
+                    'enabled_ms': enabled_ms,
+                    'overhead_ms': enabled_ms - disabled_ms,
+                    'overhead_pct': (
+                        (enabled_ms - disabled_ms) / disabled_ms * 100
+                    ),
+                }
+                stdout.write(
+                    f'{path:<45} выключено {disabled_ms:>7.2f} мс '
+                    f'включено {enabled_ms:>7.2f} мс '
+                    f'({results[path]["overhead_pct"]:+.1f}%)'
+                )
+            raise Rollback
+    except Rollback:
+        pass
+
+    return results
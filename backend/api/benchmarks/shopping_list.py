@@ -0,0 +1,144 @@
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.http import FileResponse
+
+from api.shopping_list import (EXPORT_FORMATS,
+                               get_shopping_list_rows,
+                               make_shopping_list_response)
+from recipes.cart_totals import refresh_cart_totals
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from users.models import User
+
+RECIPES = 20
+BATCH_SIZE = 5_000
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_response(user):
+    """Прежняя выгрузка: одна строка str, отдаваемая через FileResponse."""
+    ingredients = RecipeIngredient.objects.filter(
+        recipe__shoppingcart__user=user
+    ).values('ingredient').annotate(
+        total_amount=Sum('amount')
+    ).values_list(
+        'ingredient__name',
+        'total_amount',
+        'ingredient__measurement_unit'
+    )
+    formatted_list_ingredients = [
+        f'{ingredient[0]} ({ingredient[2]}) — {ingredient[1]}.'
+        for ingredient in ingredients
+    ]
+    time = datetime.now().strftime('%d.%m.%Y %H:%M:%S')
+    text_for_download = 'Cписок покупок:\n' + '\n'.join(
+        formatted_list_ingredients
+    ) + f'\n\nДата создания списка: {time}'
+
+    return FileResponse(
+        text_for_download,
+        as_attachment=True,
+        filename=settings.FILE_NAME,
+        headers={'Content-Type': 'text/plain'}
+    )
+
+
+def seed(size):
+    user = User.objects.create(
+        username='benchmark_cart', email='benchmark_cart@foodgram.ru'
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(size)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=user,
+            name=f'Рецепт {number}',
+            text='Benchmark',
+            image='recipe/images/benchmark.png',
+            cooking_time=1,
+        )
+        for number in range(RECIPES)
+    )
+    RecipeIngredient.objects.bulk_create(
+        (
+            RecipeIngredient(
+                recipe=recipes[(number + shift) % RECIPES],
+                ingredient=ingredient,
+                amount=number % 500 + 1,
+            )
+            for number, ingredient in enumerate(ingredients)
+            for shift in range(2)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes
+    )
+    refresh_cart_totals([user.id], batch_size=BATCH_SIZE)
+
+    return user
+
+
+def measure(make_response):
+    """Время, число блоков, размер и пик памяти при отдаче ответа."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = make_response()
+    chunks = 0
+    length = 0
+    for chunk in response:
+        chunks += 1
+        length += len(chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ms': elapsed * 1000,
+        'chunks': chunks,
+        'bytes': length,
+        'peak_bytes': peak,
+        'mb_per_s': length / elapsed / 2**20,
+    }
+
+
+def run(stdout, size=100_000, **options):
+    results = {}
+
+    try:
+        with transaction.atomic():
+            user = seed(size)
+            variants = {'legacy': lambda: legacy_response(user)}
+            for export_format in EXPORT_FORMATS:
+                variants[export_format] = (
+                    lambda export_format=export_format:
+                    make_shopping_list_response(
+                        get_shopping_list_rows(user), export_format
+                    )
+                )
+
+            for name, make_response in variants.items():
+                results[name] = measure(make_response)
+                stdout.write(
+                    f'{name:<8} {results[name]["ms"]:>10.2f} мс '
+                    f'{results[name]["mb_per_s"]:>8.2f} МБ/с '
+                    f'блоков {results[name]["chunks"]:>9} '
+                    f'пик {results[name]["peak_bytes"] / 2**20:.2f} МБ'
+                )
+            raise Rollback
+    except Rollback:
+        pass
+
+    return results
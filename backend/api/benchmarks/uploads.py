@@ -0,0 +1,100 @@
+import base64
+import io
+import json
+import os
+import tracemalloc
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+IMAGE_SIDE = 1800
+
+
+def make_image():
+    """PNG из случайного шума (около 10 МБ, почти не сжимается)."""
+    image = Image.frombytes(
+        'RGB', (IMAGE_SIDE, IMAGE_SIDE), os.urandom(IMAGE_SIDE ** 2 * 3)
+    )
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+
+    return buffer.getvalue()
+
+
+def measure(request, user):
+    """Пиковый объем памяти Python при обработке запроса создания."""
+    force_authenticate(request, user=user)
+    view = RecipeViewSet.as_view({'post': 'create'})
+
+    tracemalloc.start()
+    response = view(request)
+    response.render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    request.close()
+
+    assert response.status_code == 201, response.content
+    image = Recipe.objects.get(pk=response.data['id']).image.name
+    default_storage.delete(image)
+
+    return peak
+
+
+class Rollback(Exception):
+    pass
+
+
+def run(stdout, **options):
+    factory = APIRequestFactory()
+    content = make_image()
+    fields = {'name': 'Benchmark', 'text': 'Benchmark', 'cooking_time': 1}
+    results = {'image_bytes': len(content)}
+
+    try:
+        with transaction.atomic():
+            user = User.objects.create(
+                username='benchmark_upload',
+                email='benchmark_upload@foodgram.ru'
+            )
+            tag = Tag.objects.create(
+                name='benchmark', color='#000000', slug='benchmark-upload'
+            )
+            ingredient = Ingredient.objects.create(
+                name='benchmark upload', measurement_unit='г'
+            )
+            ingredients = [{'id': ingredient.id, 'amount': 1}]
+
+            request = factory.post('/api/recipes/', data=json.dumps({
+                **fields,
+                'tags': [tag.id],
+                'ingredients': ingredients,
+                'image': 'data:image/png;base64,'
+                         + base64.b64encode(content).decode(),
+            }), content_type='application/json')
+            results['base64_json_peak'] = measure(request, user)
+
+            Recipe.objects.filter(author=user).delete()
+            upload = io.BytesIO(content)
+            upload.name = 'benchmark.png'
+            request = factory.post('/api/recipes/', data={
+                **fields,
+                'tags': [tag.id],
+                'ingredients': json.dumps(ingredients),
+                'image': upload,
+            }, format='multipart')
+            results['multipart_peak'] = measure(request, user)
+
+            raise Rollback
+    except Rollback:
+        pass
+
+    for name, value in results.items():
+        stdout.write(f'{name:<20} {value / 2**20:>9.2f} МБ')
+
+    return results
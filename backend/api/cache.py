@@ -0,0 +1,116 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+CACHE_PREFIX = 'recipes'
+CACHE_QUERY_PARAMS = [
+    'author', 'cursor', 'limit', 'name', 'page', 'pagination', 'tags'
+]
+HITS_KEY = f'{CACHE_PREFIX}:hits'
+MISSES_KEY = f'{CACHE_PREFIX}:misses'
+
+
+def get_version_key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    """Версия набора данных.
+
+    Значение является отметкой времени в наносекундах и только
+    возрастает, поэтому служит также датой последнего изменения.
+    """
+    return cache.get_or_set(
+        get_version_key(name), time.time_ns, timeout=None
+    )
+
+
+def bump_version(name):
+    key = get_version_key(name)
+    version = max(time.time_ns(), cache.get(key, 0) + 1)
+    cache.set(key, version, timeout=None)
+
+    return version
+
+
+def get_version_datetime(name):
+    return datetime.fromtimestamp(get_version(name) / 10**9, timezone.utc)
+
+
+def increment_counter(key):
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_stats():
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+        'generation': cache.get(get_version_key(CACHE_PREFIX)),
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def make_cache_key(request, action, kwargs):
+    query = urlencode(sorted(
+        (param, value)
+        for param in CACHE_QUERY_PARAMS
+        for value in request.query_params.getlist(param)
+    ))
+    raw_key = '|'.join([
+        request.get_host(),
+        action,
+        str(kwargs.get('pk', '')),
+        query,
+    ])
+
+    return '{}:{}:{}'.format(
+        CACHE_PREFIX,
+        get_version(CACHE_PREFIX),
+        hashlib.md5(raw_key.encode()).hexdigest()
+    )
+
+
+def cache_anonymous_response(view_method):
+    """Кеширование ответов анонимным пользователям.
+
+    Ключ строится из нормализованной строки запроса и поколения кеша,
+    которое увеличивается сигналами при изменении рецептов.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        timeout = settings.RECIPES_CACHE_TTL
+
+        if not timeout or not request.user.is_anonymous:
+            return view_method(self, request, *args, **kwargs)
+
+        key = make_cache_key(request, self.action, kwargs)
+        data = cache.get(key)
+
+        if data is not None:
+            increment_counter(HITS_KEY)
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        increment_counter(MISSES_KEY)
+        response = view_method(self, request, *args, **kwargs)
+
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=timeout)
+        response['X-Cache'] = 'MISS'
+
+        return response
+
+    return wrapper
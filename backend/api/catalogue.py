@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import threading
+
+from django.http import HttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import patch_vary_headers
+
+from api.cache import get_version
+
+GZIP_LEVEL = 6
+BUFFERED_FORMATS = {'json', 'msgpack'}
+
+
+class CatalogueBuffer:
+    """Готовое тело ответа справочника и его сжатый вариант."""
+
+    def __init__(self, catalogue, version, media_type, content):
+        self.version = version
+        self.content = content
+        self.gzip_content = gzip.compress(content, GZIP_LEVEL, mtime=0)
+        self.etag = make_catalogue_etag(catalogue, version, media_type)
+        self.gzip_etag = make_catalogue_etag(
+            catalogue, version, media_type, 'gzip'
+        )
+
+
+_buffers = {}
+_lock = threading.Lock()
+
+
+def make_catalogue_etag(catalogue, version, media_type, encoding=None):
+    """Сильный ETag, однозначно определяемый версией каталога."""
+    digest = hashlib.md5(media_type.encode()).hexdigest()[:8]
+    suffix = f'-{encoding}' if encoding else ''
+
+    return f'"{catalogue}-{version}-{digest}{suffix}"'
+
+
+def accepts_gzip(request):
+    return bool(re_accepts_gzip.search(
+        request.META.get('HTTP_ACCEPT_ENCODING', '')
+    ))
+
+
+def is_buffered(view, request):
+    """Отдается ли запрос из буфера: полный список без параметров."""
+    return (
+        view.action == 'list'
+        and not request.query_params
+        and request.accepted_renderer.format in BUFFERED_FORMATS
+    )
+
+
+def get_buffer_etag(view, request):
+    return make_catalogue_etag(
+        view.catalogue,
+        get_version(view.catalogue),
+        request.accepted_media_type,
+        'gzip' if accepts_gzip(request) else None
+    )
+
+
+def get_buffer(view, request):
+    """Буфер текущей версии каталога, собирается один раз на процесс."""
+    version = get_version(view.catalogue)
+    key = (view.catalogue, request.accepted_media_type)
+    buffer = _buffers.get(key)
+
+    if buffer is None or buffer.version != version:
+        with _lock:
+            buffer = _buffers.get(key)
+            if buffer is None or buffer.version != version:
+                renderer = request.accepted_renderer
+                buffer = CatalogueBuffer(
+                    view.catalogue,
+                    version,
+                    request.accepted_media_type,
+                    renderer.render(
+                        view.get_catalogue_data(),
+                        request.accepted_media_type,
+                        view.get_renderer_context()
+                    )
+                )
+                _buffers[key] = buffer
+
+    return buffer
+
+
+def get_buffered_response(view, request):
+    buffer = get_buffer(view, request)
+    renderer = request.accepted_renderer
+    content_type = request.accepted_media_type
+    if renderer.charset:
+        content_type = f'{content_type}; charset={renderer.charset}'
+
+    if accepts_gzip(request):
+        response = HttpResponse(buffer.gzip_content, content_type)
+        response['Content-Encoding'] = 'gzip'
+        response['ETag'] = buffer.gzip_etag
+    else:
+        response = HttpResponse(buffer.content, content_type)
+        response['ETag'] = buffer.etag
+
+    response['Content-Length'] = len(response.content)
+    patch_vary_headers(response, ['Accept-Encoding'])
+
+    return response
@@ -0,0 +1,119 @@
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import Manager
+from rest_framework.fields import (FileField,
+                                   ReadOnlyField,
+                                   SerializerMethodField)
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def get_attribute_getter(field):
+    if not field.source_attrs:
+        return lambda instance: instance
+
+    return attrgetter('.'.join(field.source_attrs))
+
+
+def get_bound_serializer(root, serializer_class):
+    """Экземпляр сериализатора для вызова get_<field> методов.
+
+    Создается один раз на корневой сериализатор и разделяет с ним
+    контекст.
+    """
+    if isinstance(root, serializer_class):
+        return root
+
+    bound = root.__dict__.setdefault('_compiled_bound', {})
+    if serializer_class not in bound:
+        bound[serializer_class] = serializer_class(context=root.context)
+
+    return bound[serializer_class]
+
+
+class CompiledSerializer:
+    """Read-only представление сериализатора в виде плоских функций.
+
+    Поля сериализатора разбираются один раз при импорте, после чего
+    объект превращается в словарь без обхода механизма полей DRF.
+    Результат совпадает с Serializer.to_representation.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.steps = [
+            (field.field_name, self.compile_field(field))
+            for field in serializer_class().fields.values()
+            if not field.write_only
+        ]
+
+    def __call__(self, instance, root):
+        return {name: step(instance, root) for name, step in self.steps}
+
+    def compile_field(self, field):
+        get = get_attribute_getter(field)
+
+        if isinstance(field, SerializerMethodField):
+            serializer_class = self.serializer_class
+            method_name = field.method_name
+
+            def step(instance, root):
+                serializer = get_bound_serializer(root, serializer_class)
+                return getattr(serializer, method_name)(instance)
+
+        elif isinstance(field, ListSerializer):
+            child = CompiledSerializer(type(field.child))
+
+            def step(instance, root):
+                value = get(instance)
+                if value is None:
+                    return None
+                if isinstance(value, Manager):
+                    value = value.all()
+                return [child(item, root) for item in value]
+
+        elif isinstance(field, BaseSerializer):
+            child = CompiledSerializer(type(field))
+
+            def step(instance, root):
+                value = get(instance)
+                return None if value is None else child(value, root)
+
+        elif isinstance(field, FileField) and not getattr(
+            field, 'represent_in_base64', False
+        ):
+            def step(instance, root):
+                value = get(instance)
+                if not value:
+                    return None
+                try:
+                    url = value.url
+                except AttributeError:
+                    return None
+                request = root.context.get('request')
+                return request.build_absolute_uri(url) if request else url
+
+        elif isinstance(field, ReadOnlyField):
+            def step(instance, root):
+                return get(instance)
+
+        else:
+            to_representation = field.to_representation
+
+            def step(instance, root):
+                value = get(instance)
+                return None if value is None else to_representation(value)
+
+        return step
+
+
+class CompiledRepresentationMixin:
+    """Скомпилированное представление при FAST_SERIALIZATION."""
+
+    compiled = None
+
+    def to_representation(self, instance):
+        if self.compiled is None or not settings.FAST_SERIALIZATION:
+            return super().to_representation(instance)
+
+        return self.compiled(instance, self)
@@ -0,0 +1,120 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import (get_conditional_response,
+                                patch_vary_headers,
+                                quote_etag)
+from django.utils.http import http_date
+
+from api.cache import CACHE_PREFIX, get_version, get_version_datetime
+from api.catalogue import (get_buffer_etag,
+                           get_buffered_response,
+                           is_buffered)
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def get_user_stamp(request):
+    """Версия данных пользователя: подписки, избранное и корзина."""
+    user = request.user
+
+    if user.is_anonymous:
+        return 'anonymous', None
+
+    name = f'user:{user.id}'
+
+    return (user.id, get_version(name)), get_version_datetime(name)
+
+
+def get_generation_validators(request, *parts):
+    """Валидаторы анонимного ответа по поколению кеша рецептов.
+
+    Поколение меняется при любом изменении данных, попадающих в ответы
+    анонимным пользователям, поэтому ETag строится без запросов к базе.
+    """
+    return make_etag(
+        CACHE_PREFIX,
+        get_version(CACHE_PREFIX),
+        *parts,
+        request.query_params.urlencode(),
+        request.accepted_media_type,
+    ), get_version_datetime(CACHE_PREFIX)
+
+
+def conditional_response(validators):
+    """Условный GET по If-None-Match / If-Modified-Since.
+
+    validators - имя метода представления, возвращающего пару
+    (etag, last_modified) до выполнения основного запроса. Если клиент
+    уже имеет актуальную версию, ответ 304 отдается без сериализации.
+    """
+
+    def decorator(view_method):
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified = getattr(self, validators)(
+                request, *args, **kwargs
+            )
+            timestamp = (
+                int(last_modified.timestamp()) if last_modified else None
+            )
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                if etag and not response.has_header('ETag'):
+                    response['ETag'] = etag
+                if timestamp and not response.has_header('Last-Modified'):
+                    response['Last-Modified'] = http_date(timestamp)
+                patch_vary_headers(response, ['Accept', 'Authorization'])
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+class CatalogueConditionalMixin:
+    """Условный GET для справочников по версии каталога.
+
+    Полный список без параметров отдается из заранее отрендеренного
+    буфера без запросов к базе и без сериализации.
+    """
+
+    catalogue = None
+
+    def get_catalogue_data(self):
+        return self.get_serializer(self.get_queryset(), many=True).data
+
+    def get_catalogue_validators(self, request, *args, **kwargs):
+        if is_buffered(self, request):
+            etag = get_buffer_etag(self, request)
+        else:
+            etag = make_etag(
+                self.catalogue,
+                get_version(self.catalogue),
+                kwargs.get('pk'),
+                request.query_params.urlencode(),
+                request.accepted_media_type,
+            )
+
+        return etag, get_version_datetime(self.catalogue)
+
+    @conditional_response('get_catalogue_validators')
+    def list(self, request, *args, **kwargs):
+        if is_buffered(self, request):
+            return get_buffered_response(self, request)
+
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response('get_catalogue_validators')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,87 @@
+import uuid
+
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+MAX_IMAGE_SIDE = 10_000
+UPLOAD_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+}
+
+
+class RecipeImageField(Base64ImageField):
+    """Картинка рецепта строкой base64 или файлом multipart/form-data.
+
+    Загруженный файл не декодируется целиком: формат и размеры
+    проверяются по заголовку изображения.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, UploadedFile):
+            return super().to_internal_value(data)
+
+        try:
+            with Image.open(data) as image:
+                image_format = image.format
+                width, height = image.size
+        except (UnidentifiedImageError, OSError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+
+        if image_format not in UPLOAD_FORMATS:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+
+        if max(width, height) > MAX_IMAGE_SIDE:
+            raise serializers.ValidationError(
+                f'Размер картинки не должен превышать '
+                f'{MAX_IMAGE_SIDE}x{MAX_IMAGE_SIDE} пикселей.'
+            )
+
+        data.seek(0)
+        data.name = f'{uuid.uuid4()}.{UPLOAD_FORMATS[image_format]}'
+
+        return data
+
+
+class PrimaryKeyListField(serializers.ManyRelatedField):
+    """Список первичных ключей, объекты загружаются одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        keys = []
+        for item in data:
+            if isinstance(item, bool):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                keys.append(int(item))
+            except (TypeError, ValueError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+
+        objects = child.get_queryset().in_bulk(keys)
+        for key in keys:
+            if key not in objects:
+                child.fail('does_not_exist', pk_value=key)
+
+        return [objects[key] for key in keys]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, при many=True без запроса на каждый ключ."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return PrimaryKeyListField(**list_kwargs)
@@ -1,6 +1,19 @@
+import re
+
+from django.contrib.postgres.search import (SearchQuery,
+                                            SearchRank,
+                                            SearchVector,
+                                            TrigramSimilarity)
+from django.db import connections
+from django.db.models import Q
 from django_filters.rest_framework import filters, FilterSet
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
 
 from recipes.models import Recipe, Tag
+from recipes.search import FTS_TABLE as SQLITE_FTS_TABLE
+
+SQLITE_FTS_AVAILABLE = {}
 
 
 class RecipeFilter(FilterSet):
@@ -33,3 +46,76 @@ class RecipeFilter(FilterSet):
         return queryset.filter(
             shoppingcart__user=user
         ) if value and user.is_authenticated else queryset
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """Поиск рецептов по названию с сортировкой по релевантности.
+
+    PostgreSQL: полнотекстовый поиск с русской морфологией и триграммы
+    (индексы GIN), SQLite: таблица FTS5. На остальных СУБД - icontains.
+    """
+
+    search_param = api_settings.SEARCH_PARAM
+    search_config = 'russian'
+
+    def get_search_terms(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_terms(request)
+
+        if not query:
+            return queryset
+
+        vendor = connections[queryset.db].vendor
+
+        if vendor == 'postgresql':
+            return self.filter_postgresql(queryset, query)
+
+        if vendor == 'sqlite' and self.has_sqlite_fts(queryset.db):
+            return self.filter_sqlite(queryset, query)
+
+        return queryset.filter(name__icontains=query)
+
+    def filter_postgresql(self, queryset, query):
+        vector = SearchVector('name', config=self.search_config)
+        search_query = SearchQuery(
+            query, config=self.search_config, search_type='websearch'
+        )
+
+        return queryset.annotate(
+            search=vector
+        ).filter(
+            Q(search=search_query) | Q(name__icontains=query)
+        ).annotate(
+            rank=SearchRank(vector, search_query),
+            similarity=TrigramSimilarity('name', query)
+        ).order_by('-rank', '-similarity', '-pub_date', '-id')
+
+    def filter_sqlite(self, queryset, query):
+        terms = re.findall(r'\w+', query.replace('ё', 'е').replace('Ё', 'Е'))
+
+        if not terms:
+            return queryset.none()
+
+        match = ' '.join(f'"{term}"*' for term in terms)
+        table = SQLITE_FTS_TABLE
+
+        return queryset.extra(
+            tables=[table],
+            where=[
+                f'{table}.rowid = {Recipe._meta.db_table}.id',
+                f'{table} MATCH %s',
+            ],
+            params=[match],
+            select={'rank': f'{table}.rank'},
+        ).order_by('rank', '-pub_date', '-id')
+
+    def has_sqlite_fts(self, alias):
+        if alias not in SQLITE_FTS_AVAILABLE:
+            SQLITE_FTS_AVAILABLE[alias] = (
+                SQLITE_FTS_TABLE
+                in connections[alias].introspection.table_names()
+            )
+
+        return SQLITE_FTS_AVAILABLE[alias]
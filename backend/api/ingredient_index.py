@@ -0,0 +1,135 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from django.db import DatabaseError, connections
+
+from api.cache import get_version
+from recipes.models import Ingredient
+
+CATALOGUE = 'ingredients'
+
+
+def fold(text):
+    return text.lower().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Отсортированный индекс ингредиентов для автодополнения.
+
+    Поиск по префиксу выполняется бинарным поиском, затем добавляются
+    совпадения по подстроке. Регистр и ё/е не различаются.
+    """
+
+    def __init__(self, rows, version=None):
+        entries = sorted(
+            (
+                (fold(name), {
+                    'id': pk,
+                    'name': name,
+                    'measurement_unit': measurement_unit,
+                })
+                for pk, name, measurement_unit in rows
+            ),
+            key=lambda entry: (entry[0], entry[1]['id'])
+        )
+        self.version = version
+        self.keys = [key for key, _ in entries]
+        self.items = [item for _, item in entries]
+        self.by_id = {item['id']: item for item in self.items}
+        self.text = '\n'.join(self.keys)
+        self.offsets = []
+        offset = 0
+        for key in self.keys:
+            self.offsets.append(offset)
+            offset += len(key) + 1
+
+    def find_substring(self, query, limit=None):
+        """Позиции названий, содержащих query не с начала."""
+        positions = []
+        found = self.text.find(query)
+        while found != -1 and (limit is None or len(positions) < limit):
+            position = bisect_right(self.offsets, found) - 1
+            if found != self.offsets[position]:
+                positions.append(position)
+            next_offset = (
+                self.offsets[position + 1]
+                if position + 1 < len(self.offsets) else len(self.text)
+            )
+            found = self.text.find(query, next_offset)
+        return positions
+
+    def search(self, query, limit=None):
+        query = fold(query.strip())
+
+        if not query:
+            return self.items[:limit]
+
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + '\uffff', start)
+        if limit is not None:
+            end = min(end, start + limit)
+        results = self.items[start:end]
+
+        if limit is None or len(results) < limit:
+            results += [
+                self.items[position]
+                for position in self.find_substring(
+                    query, None if limit is None else limit - len(results)
+                )
+            ]
+
+        return results[:limit]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def build_index(version=None):
+    return IngredientIndex(
+        Ingredient.objects.values_list('id', 'name', 'measurement_unit'),
+        version
+    )
+
+
+def get_index():
+    """Индекс текущей версии каталога, перестраивается при ее смене."""
+    global _index
+
+    version = get_version(CATALOGUE)
+    if _index is None or _index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = build_index(version)
+
+    return _index
+
+
+def get_built_index():
+    """Уже построенный индекс актуальной версии или None."""
+    if _index is not None and _index.version == get_version(CATALOGUE):
+        return _index
+
+    return None
+
+
+def preload_index():
+    """Построение индекса до форка воркеров (gunicorn --preload)."""
+    try:
+        get_index()
+    except DatabaseError:
+        pass
+    finally:
+        connections.close_all()
+
+
+def get_ingredients(ids):
+    """Ингредиенты по id: из построенного индекса или одним IN-запросом."""
+    index = get_built_index()
+
+    if index is None:
+        return Ingredient.objects.in_bulk(ids)
+
+    return {
+        pk: Ingredient(**index.by_id[pk]) for pk in ids if pk in index.by_id
+    }
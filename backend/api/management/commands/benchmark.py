@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import BENCHMARKS
+from api.benchmarks.baseline import compare
+
+
+class Command(BaseCommand):
+    help = 'Run API performance benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help=(
+                f'Benchmarks to run: {", ".join(BENCHMARKS)} '
+                '(all by default).'
+            )
+        )
+        parser.add_argument(
+            '--size',
+            type=int,
+            help=(
+                'Number of rows seeded by benchmarks that need data '
+                '(each benchmark has its own default).'
+            )
+        )
+        parser.add_argument(
+            '--output',
+            help='Write results to a JSON file.'
+        )
+        parser.add_argument(
+            '--baseline',
+            help=(
+                'Compare results with a JSON file written by --output '
+                'and fail on regressions.'
+            )
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Allowed relative growth of time and memory metrics.'
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f'Неизвестные бенчмарки: {", ".join(unknown)}')
+
+        # Не заданные параметры не передаются, действуют значения
+        # по умолчанию самих бенчмарков.
+        params = {
+            key: value for key, value in options.items() if value is not None
+        }
+        results = {}
+        for name in options['names'] or BENCHMARKS:
+            self.stdout.write(self.style.SUCCESS(f'######## {name} ########'))
+            results[name] = BENCHMARKS[name](self.stdout, **params)
+
+        if options['output']:
+            with open(options['output'], mode='w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=4)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError(
+                    'Регрессии относительно эталона:\n'
+                    + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS(
+                'Регрессий относительно эталона нет.'
+            ))
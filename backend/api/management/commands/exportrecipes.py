@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api.transfer import EXPORT_CHUNK_SIZE, export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Export recipes with tags and ingredients as NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='Path of the NDJSON file (stdout by default).'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Number of recipes fetched from the database at once.'
+        )
+
+    def handle(self, *args, **options):
+        lines = export_recipes(chunk_size=options['chunk_size'])
+
+        if not options['output']:
+            sys.stdout.writelines(lines)
+            return
+
+        count = 0
+        with open(options['output'], mode='w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line)
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {count}'
+        ))
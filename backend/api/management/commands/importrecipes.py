@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from tqdm import tqdm
+
+from api.transfer import IMPORT_BATCH_SIZE, import_recipes
+
+
+class Command(BaseCommand):
+    help = 'Import recipes from an NDJSON file produced by exportrecipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Path of the NDJSON file.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Number of recipes saved in one transaction.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            '########## START IMPORT RECIPES ##########'
+        ))
+        try:
+            f = open(options['path'], mode='r', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Не удалось открыть файл: {e}')
+
+        with f, tqdm(
+            desc='Процесс загрузки рецептов:',
+            ncols=100,
+            unit=' recipes'
+        ) as progress:
+            for event in import_recipes(f, options['batch_size']):
+                if 'errors' in event:
+                    progress.write(self.style.ERROR(
+                        f'Строка {event["line"]}: {event["errors"]}'
+                    ))
+                else:
+                    progress.update(event['processed'] - progress.n)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {event["processed"]}, '
+            f'создано рецептов: {event["created"]}, '
+            f'ошибок: {event["failed"]}'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            '############# FINISH IMPORT #############'
+        ))
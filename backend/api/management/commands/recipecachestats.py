@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the anonymous recipes cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset counters after output.'
+        )
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+
+        self.stdout.write(
+            f'Попадания: {stats["hits"]}\n'
+            f'Промахи: {stats["misses"]}\n'
+            f'Доля попаданий: {ratio:.2%}\n'
+            f'Поколение кеша: {stats["generation"]}'
+        )
+
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Счетчики сброшены.'))
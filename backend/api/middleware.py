@@ -0,0 +1,117 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTiming:
+    """Замеры одного запроса: SQL через execute_wrapper и рендеринг."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+        self.render_start = None
+        self.render = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db += duration
+            if duration > self.slowest:
+                self.slowest = duration
+                self.slowest_sql = sql
+
+    def rendered(self, response):
+        self.render = time.perf_counter() - self.render_start
+
+
+class ServerTimingMiddleware:
+    """Заголовок Server-Timing: время SQL, рендеринга и запроса целиком.
+
+    Включается настройкой REQUEST_TIMING, без нее Django исключает
+    middleware из цепочки при загрузке. Запросы дольше
+    REQUEST_TIMING_BUDGET_MS пишутся в лог одной JSON-строкой. У потоковых
+    ответов учитывается только время до начала отдачи тела.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.budget = settings.REQUEST_TIMING_BUDGET_MS / 1000
+
+    def __call__(self, request):
+        timing = request.timing = RequestTiming()
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing))
+            response = self.get_response(request)
+
+        total = time.perf_counter() - start
+        # Заголовок мог выставить debug_toolbar, метрики дописываются.
+        response['Server-Timing'] = ', '.join(filter(None, [
+            response.get('Server-Timing'), self.get_header(timing, total)
+        ]))
+
+        if total > self.budget:
+            self.log(request, response, timing, total)
+
+        return response
+
+    def process_template_response(self, request, response):
+        # Ответ DRF рендерится сразу после этого вызова, конец рендеринга
+        # фиксирует post-render callback.
+        request.timing.render_start = time.perf_counter()
+        response.add_post_render_callback(request.timing.rendered)
+
+        return response
+
+    @staticmethod
+    def get_header(timing, total):
+        metrics = [
+            ('db', timing.db, f'{timing.queries} queries'),
+            ('db-slowest', timing.slowest, None),
+            ('render', timing.render, None),
+            ('app', total - timing.db - (timing.render or 0), None),
+            ('total', total, None),
+        ]
+
+        return ', '.join(
+            f'{name};dur={duration * 1000:.2f}'
+            + (f';desc="{description}"' if description else '')
+            for name, duration, description in metrics
+            if duration is not None
+        )
+
+    @staticmethod
+    def log(request, response, timing, total):
+        logger.warning(json.dumps({
+            'event': 'request_over_budget',
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(timing.db * 1000, 2),
+            'queries': timing.queries,
+            'render_ms': (
+                round(timing.render * 1000, 2)
+                if timing.render is not None else None
+            ),
+            'slowest_ms': round(timing.slowest * 1000, 2),
+            'slowest_sql': timing.slowest_sql,
+        }, ensure_ascii=False))
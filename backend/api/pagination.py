@@ -1,5 +1,133 @@
-from rest_framework.pagination import PageNumberPagination
+from datetime import datetime
+
+from django.db.models import BooleanField, DateTimeField, Func, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor,
+                                       CursorPagination,
+                                       PageNumberPagination)
 
 
 class CustomPaginator(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RowComparison(Func):
+    """Сравнение кортежей: (a, b) < (x, y).
+
+    Поддерживается PostgreSQL и SQLite (3.15+) и использует составной
+    индекс по тем же полям.
+    """
+
+    output_field = BooleanField()
+
+    def __init__(self, fields, values, operator):
+        super().__init__(*fields, *values)
+        self.operator = operator
+        self.size = len(fields)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql_parts = []
+        params = []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            sql_parts.append(sql)
+            params.extend(expression_params)
+
+        return '({}) {} ({})'.format(
+            ', '.join(sql_parts[:self.size]),
+            self.operator,
+            ', '.join(sql_parts[self.size:]),
+        ), params
+
+
+class RecipeCursorPaginator(CursorPagination):
+    """Курсорная пагинация ленты рецептов.
+
+    Включается параметром ?pagination=cursor, не выполняет COUNT(*)
+    и OFFSET по всей выборке, возвращает непрозрачные ссылки
+    next/previous. Курсор хранит пару (pub_date, id) последней записи
+    страницы, следующая страница выбирается условием
+    (pub_date, id) < (pub_date курсора, id курсора).
+    """
+
+    ordering = ['-pub_date', '-id']
+    page_size_query_param = 'limit'
+    mode_query_param = 'pagination'
+    mode = 'cursor'
+    position_separator = '|'
+
+    @classmethod
+    def is_requested(cls, request):
+        return (
+            request.query_params.get(cls.mode_query_param) == cls.mode
+            or cls.cursor_query_param in request.query_params
+        )
+
+    def get_position(self, instance):
+        return self.position_separator.join(
+            [instance.pub_date.isoformat(), str(instance.pk)]
+        )
+
+    def parse_position(self, position):
+        try:
+            pub_date, pk = position.split(self.position_separator)
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        has_position = self.cursor is not None
+
+        # Назад (к более новым записям) страница читается в прямом
+        # порядке и затем разворачивается.
+        if reverse:
+            queryset = queryset.order_by('pub_date', 'id')
+        else:
+            queryset = queryset.order_by('-pub_date', '-id')
+
+        if has_position:
+            pub_date, pk = self.parse_position(self.cursor.position)
+            queryset = queryset.filter(RowComparison(
+                ['pub_date', 'id'],
+                [
+                    Value(pub_date, output_field=DateTimeField()),
+                    Value(pk),
+                ],
+                '>' if reverse else '<'
+            ))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = has_position, has_more
+        else:
+            self.has_next, self.has_previous = has_more, has_position
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False, position=self.get_position(self.page[-1])
+        ))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True, position=self.get_position(self.page[0])
+        ))
@@ -0,0 +1,122 @@
+import json
+import logging
+import random
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDERS = re.compile(r'\(%s(?:, %s)*\)')
+TRANSACTION_STATEMENTS = (
+    'BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO'
+)
+STACK_LIMIT = 25
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """Счетчик SQL-запросов одного запроса к представлению.
+
+    Формой запроса считается SQL без параметров, списки IN разной длины
+    сводятся к одной форме. Повтор формы QUERY_BUDGET_REPEATS раз
+    означает запрос в цикле (N+1). Запросы только подсчитываются, стек
+    запоминается на первом лишнем запросе; проверка выполняется после
+    ответа представления.
+    """
+
+    def __init__(self, view):
+        self.view = view
+        self.count = 0
+        self.shapes = Counter()
+        self.violations = []
+
+    @property
+    def budget(self):
+        return self.view.query_budgets.get(getattr(self.view, 'action', None))
+
+    def __call__(self, execute, sql, params, many, context):
+        budget = self.budget
+
+        if budget is not None and not sql.startswith(TRANSACTION_STATEMENTS):
+            self.count += 1
+            shape = PLACEHOLDERS.sub('(%s, ...)', sql)
+            self.shapes[shape] += 1
+
+            if self.count == budget + 1:
+                self.record(f'больше {budget} запросов', sql)
+            if self.shapes[shape] == settings.QUERY_BUDGET_REPEATS:
+                self.record(
+                    f'запрос повторился {self.shapes[shape]} раза', sql
+                )
+
+        return execute(sql, params, many, context)
+
+    def record(self, reason, sql):
+        name = f'{type(self.view).__name__}.{self.view.action}'
+        self.violations.append({
+            'reason': f'{name}: {reason}',
+            'sql': sql,
+            'stack': traceback.format_stack(limit=STACK_LIMIT)[:-2],
+        })
+
+    def get_report(self):
+        return '\n\n'.join(
+            f'{violation["reason"]}\n{violation["sql"]}\n'
+            + ''.join(violation['stack'])
+            for violation in self.violations
+        )
+
+    def log(self, request):
+        for violation in self.violations:
+            logger.warning(json.dumps({
+                'event': 'query_budget_exceeded',
+                'method': request.method,
+                'path': request.get_full_path(),
+                'budget': self.budget,
+                'queries': self.count,
+                **violation,
+            }, ensure_ascii=False))
+
+
+class QueryBudgetMixin:
+    """Ограничение числа SQL-запросов для действий представления.
+
+    query_budgets сопоставляет действию (list, retrieve, имени @action)
+    максимум запросов, действия без бюджета не проверяются. Нарушения
+    проверяются после ответа представления: при QUERY_BUDGET_RAISE
+    (по умолчанию равна DEBUG) поднимается QueryBudgetExceeded со стеком
+    лишнего запроса. Без отладки проверяется доля
+    QUERY_BUDGET_SAMPLE_RATE запросов, и нарушения пишутся в лог.
+    Запросы при отдаче потоковых ответов не учитываются.
+    """
+
+    query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        strict = settings.QUERY_BUDGET_RAISE
+        # Выборка нужна только в production, при отладке проверяется
+        # каждый запрос.
+        sampled = not strict and settings.DEBUG != 'True'
+
+        if sampled and random.random() >= settings.QUERY_BUDGET_SAMPLE_RATE:
+            return super().dispatch(request, *args, **kwargs)
+
+        recorder = QueryRecorder(self)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = super().dispatch(request, *args, **kwargs)
+
+        if strict and recorder.violations:
+            raise QueryBudgetExceeded(recorder.get_report())
+        recorder.log(request)
+
+        return response
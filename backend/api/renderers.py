@@ -0,0 +1,76 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson.
+
+    При отсутствии orjson, при запросе форматированного вывода (indent)
+    и для данных, которые orjson не сериализует (целые шире 64 бит),
+    используется стандартный JSONRenderer. Отличие от него: NaN и
+    Infinity выводятся как null, а не вызывают ValueError.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context
+        ) is not None:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+        if data is None:
+            return b''
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=(
+                    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+                ),
+            )
+        except TypeError:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Рендерер MessagePack для мобильных клиентов (Accept)."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder_class = JSONRenderer.encoder_class
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return msgpack.packb(
+            data, default=self.encoder_class().default, use_bin_type=True
+        )
@@ -1,15 +1,57 @@
+import json
+
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import QueryDict
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
 from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.models import Ingredient, Tag, Recipe, RecipeIngredient
+from api.compiled import CompiledRepresentationMixin, CompiledSerializer
+from api.fields import BulkPrimaryKeyRelatedField, RecipeImageField
+from api.ingredient_index import get_ingredients
+from recipes.cart_totals import refresh_recipe_cart_totals
+from recipes.images import get_variant_urls
+from recipes.models import (AuthorStats,
+                            Ingredient,
+                            Tag,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCartIngredient)
+from recipes.signals import defer_recipe_signals
 from users.models import User
 
 
-class UserListSerializer(UserSerializer):
+class IsSubscribedMixin:
+    """Проверка подписки текущего пользователя на автора.
+
+    Id авторов, на которых подписан пользователь, загружаются одним
+    запросом и хранятся в контексте сериализатора, общем для всех
+    вложенных сериализаторов.
+    """
+
+    def get_subscriptions(self):
+        if 'subscriptions' not in self.context:
+            user = self.context.get('request').user
+            self.context['subscriptions'] = set(
+                user.follower.values_list('author_id', flat=True)
+            )
+
+        return self.context['subscriptions']
+
+    def get_is_subscribed(self, data):
+        user = self.context.get('request').user
+
+        if user.is_anonymous or user == data:
+            return False
+
+        return data.id in self.get_subscriptions()
+
+
+class UserListSerializer(IsSubscribedMixin, UserSerializer):
     """Сериализатор пользователей."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -25,15 +67,6 @@ class UserListSerializer(UserSerializer):
             'is_subscribed',
         ]
 
-    def get_is_subscribed(self, data):
-        request = self.context.get('request')
-        user = request.user
-
-        if user.is_anonymous or user == data:
-            return False
-
-        return user.follower.filter(author=data).exists()
-
 
 class UserCreateSerializer(UserCreateSerializer):
     """Сериализатор создания пользователя."""
@@ -135,12 +168,58 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ['name', 'cooking_time']
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorRecipesMixin:
+    """Рецепты автора с учетом параметра recipes_limit.
+
+    Если авторы загружены с recipes_prefetch, рецепты берутся из
+    атрибута latest_recipes без дополнительных запросов. Количество
+    рецептов читается из AuthorStats (select_related('stats')).
+    """
+
+    @staticmethod
+    def get_recipes_limit(request):
+        limit = request.query_params.get('recipes_limit')
+
+        return int(limit) if limit and limit.isdigit() else None
+
+    @classmethod
+    def recipes_prefetch(cls, request):
+        return Prefetch(
+            'recipes',
+            queryset=Recipe.objects.latest_per_author(
+                cls.get_recipes_limit(request)
+            ),
+            to_attr='latest_recipes'
+        )
+
+    def get_recipes(self, data):
+        recipes = getattr(data, 'latest_recipes', None)
+
+        if recipes is None:
+            limit = self.get_recipes_limit(self.context['request'])
+            recipes = data.recipes.all()[:limit]
+
+        serializer = RecipeSerializer(
+            recipes, many=True, read_only=True
+        )
+
+        return serializer.data
+
+    def get_recipes_count(self, data):
+        try:
+            return data.stats.recipes_count
+        except AuthorStats.DoesNotExist:
+            return 0
+
+
+class AuthorSerializer(IsSubscribedMixin,
+                       AuthorRecipesMixin,
+                       serializers.ModelSerializer):
     """Сериализатор авторов."""
 
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField()
+    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -155,28 +234,10 @@ class AuthorSerializer(serializers.ModelSerializer):
             'recipes_count'
         ]
 
-    def get_is_subscribed(self, data):
-        user = self.context.get('request').user
-
-        if user.is_anonymous or user == data:
-            return False
-
-        return user.follower.filter(author=data).exists()
-
-    def get_recipes(self, data):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes_all = data.recipes.all()
-        recipes = recipes_all[:int(limit)] if limit else recipes_all
-
-        serializer = RecipeSerializer(
-            recipes, many=True, read_only=True
-        )
-
-        return serializer.data
 
-
-class FollowAuthorSerializer(serializers.ModelSerializer):
+class FollowAuthorSerializer(IsSubscribedMixin,
+                             AuthorRecipesMixin,
+                             serializers.ModelSerializer):
     """Сериализатор подписки и отписки."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -197,28 +258,6 @@ class FollowAuthorSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['email', 'username', 'first_name', 'last_name']
 
-    def get_is_subscribed(self, data):
-        user = self.context.get('request').user
-
-        if user.is_anonymous or user == data:
-            return False
-
-        return user.follower.filter(author=data).exists()
-
-    def get_recipes(self, data):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes_all = data.recipes.all()
-        recipes = recipes_all[:int(limit)] if limit else recipes_all
-        serializer = RecipeSerializer(
-            recipes, many=True, read_only=True
-        )
-
-        return serializer.data
-
-    def get_recipes_count(self, data):
-        return data.recipes.count()
-
     def validate(self, data):
         if self.context.get('request').user == data:
             raise serializers.ValidationError(
@@ -266,11 +305,20 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         ]
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class ShoppingCartIngredientSerializer(RecipeIngredientSerializer):
+    """Сериализатор суммарного количества ингредиента в корзине."""
+
+    class Meta(RecipeIngredientSerializer.Meta):
+        model = ShoppingCartIngredient
+
+
+class RecipeListSerializer(CompiledRepresentationMixin,
+                           serializers.ModelSerializer):
     """Сериализатор список рецептов при GET запросе."""
 
     author = UserListSerializer(read_only=True)
     image = Base64ImageField()
+    image_variants = serializers.SerializerMethodField()
     ingredients = RecipeIngredientSerializer(
         many=True, read_only=True, source='ingredient'
     )
@@ -289,11 +337,27 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         ]
 
+    def get_image_variants(self, data):
+        if not data.image:
+            return None
+
+        request = self.context.get('request')
+        urls = get_variant_urls(data.image.name, data.image_variants_ready)
+
+        return {
+            variant: request.build_absolute_uri(url) if request else url
+            for variant, url in urls.items()
+        }
+
     def get_is_favorited(self, data):
+        if hasattr(data, 'is_favorited'):
+            return data.is_favorited
+
         user = self.context.get('request').user
 
         if user.is_anonymous or user == data:
@@ -302,6 +366,9 @@ class RecipeListSerializer(serializers.ModelSerializer):
         return user.favorites.filter(recipe=data).exists()
 
     def get_is_in_shopping_cart(self, data):
+        if hasattr(data, 'is_in_shopping_cart'):
+            return data.is_in_shopping_cart
+
         user = self.context.get('request').user
 
         if user.is_anonymous or user == data:
@@ -310,6 +377,9 @@ class RecipeListSerializer(serializers.ModelSerializer):
         return user.shoppingcart.filter(recipe=data).exists()
 
 
+RecipeListSerializer.compiled = CompiledSerializer(RecipeListSerializer)
+
+
 class RecipeChoiceIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор выбора ингредиента для создания рецепта."""
 
@@ -325,9 +395,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор создания, изменения или удаления рецепта."""
 
     author = UserListSerializer(read_only=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
     ingredients = RecipeChoiceIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all()
     )
 
@@ -352,6 +422,30 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'cooking_time': {'required': True},
         }
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = self.parse_form_data(data)
+
+        return super().to_internal_value(data)
+
+    def parse_form_data(self, data):
+        """Данные multipart/form-data: tags - повторяющееся поле,
+        ingredients - JSON-строка."""
+        parsed = data.dict()
+
+        if 'tags' in data:
+            parsed['tags'] = data.getlist('tags')
+
+        if 'ingredients' in data:
+            try:
+                parsed['ingredients'] = json.loads(data['ingredients'])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {'ingredients': 'Ингредиенты должны быть JSON-списком.'}
+                )
+
+        return parsed
+
     def validate_ingredients(self, ingredients):
         if not ingredients:
             raise serializers.ValidationError(
@@ -359,13 +453,25 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 code=status.HTTP_400_BAD_REQUEST
             )
 
+        known = get_ingredients(
+            [ingredient['id'] for ingredient in ingredients]
+        )
+        unknown = [
+            ingredient['id'] for ingredient in ingredients
+            if ingredient['id'] not in known
+        ]
+        if unknown:
+            raise serializers.ValidationError(
+                {'ingredients': [
+                    f'Указан не существующий ингредиент: {ingredient_id}.'
+                    for ingredient_id in unknown
+                ]},
+                code=status.HTTP_404_NOT_FOUND
+            )
+
         unique_ingredients = set()
         for ingredient in ingredients:
-            if not Ingredient.objects.filter(id=ingredient['id']).exists():
-                raise serializers.ValidationError(
-                    {'ingredients': 'Указан не существующий ингредиент.'},
-                    code=status.HTTP_404_NOT_FOUND
-                )
+            ingredient['ingredient'] = known[ingredient['id']]
             if ingredient['amount'] < 1:
                 raise serializers.ValidationError(
                     {'amount': 'Значение должно быть больше 0.'},
@@ -418,16 +524,71 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         return super().validate(data)
 
-    def set_tags_and_ingredients(self, recipe, tags, ingredients):
-        recipe.tags.set(tags)
-        RecipeIngredient.objects.bulk_create([
+    def set_tags(self, recipe, tags):
+        """Добавление и удаление только изменившихся тегов.
+
+        Возвращает True, если набор тегов изменился.
+        """
+        current = {tag.id for tag in recipe.tags.all()}
+        submitted = {tag.id for tag in tags}
+
+        if current - submitted:
+            recipe.tags.remove(*(current - submitted))
+        if submitted - current:
+            recipe.tags.add(*(submitted - current))
+
+        return current != submitted
+
+    def set_ingredients(self, recipe, ingredients):
+        """Приведение состава рецепта к переданному по разнице с текущим.
+
+        Удаляются только исключенные строки, количество обновляется
+        bulk_update, новые ингредиенты добавляются bulk_create. Возвращает
+        id удаленных, измененных и добавленных ингредиентов.
+        """
+        current = {
+            item.ingredient_id: item for item in recipe.ingredient.all()
+        }
+        submitted = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+
+        removed = current.keys() - submitted.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient__in=removed
+            ).delete()
+
+        changed = []
+        for ingredient_id, amount in submitted.items():
+            item = current.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+
+        created = RecipeIngredient.objects.bulk_create([
             RecipeIngredient(
                 recipe=recipe,
-                ingredient_id=ingredient['id'],
+                ingredient=ingredient['ingredient'],
                 amount=ingredient['amount']
-            ) for ingredient in ingredients
+            )
+            for ingredient in ingredients
+            if ingredient['id'] not in current
         ])
+        self.written_ingredients = [
+            item for ingredient_id, item in current.items()
+            if ingredient_id not in removed
+        ] + created
+
+        return (
+            removed
+            | {item.ingredient_id for item in changed}
+            | (submitted.keys() - current.keys())
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -436,22 +597,93 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             author=self.context['request'].user,
             **validated_data
         )
-        self.set_tags_and_ingredients(recipe, tags, ingredients)
+        # Дата изменения уже записана вместе с рецептом.
+        with defer_recipe_signals(recipe.pk):
+            recipe.tags.add(*tags)
+        self.written_ingredients = RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredient['ingredient'],
+                amount=ingredient['amount']
+            ) for ingredient in ingredients
+        ])
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
 
-        RecipeIngredient.objects.filter(
-            recipe=instance,
-            ingredient__in=instance.ingredients.all()
-        ).delete()
-
-        self.set_tags_and_ingredients(instance, tags, ingredients)
+        # Сигналы строк рецепта отложены: корзины пересчитываются явно
+        # одним запросом, а дата изменения сохраняется вместе с рецептом.
+        with defer_recipe_signals(instance.pk):
+            tags_changed = self.set_tags(instance, tags)
+            changed_ingredients = self.set_ingredients(instance, ingredients)
+        if changed_ingredients:
+            refresh_recipe_cart_totals(instance, changed_ingredients)
+
+        update_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        if update_fields or tags_changed or changed_ingredients:
+            instance.save(update_fields=[*update_fields, 'updated_at'])
 
-        return super().update(instance, validated_data)
+        return instance
 
     def to_representation(self, value):
+        # Записанные строки уже содержат проверенные объекты Ingredient,
+        # поэтому состав рецепта повторно из базы не загружается.
+        written = getattr(self, 'written_ingredients', None)
+        if written is not None:
+            value._prefetched_objects_cache = {
+                **getattr(value, '_prefetched_objects_cache', {}),
+                'ingredient': written,
+            }
+        prefetch_related_objects([value], *Recipe.objects.related_lookups())
+
         return RecipeListSerializer(value, context=self.context).data
+
+
+class RecipeImportIngredientSerializer(serializers.Serializer):
+    """Ингредиент рецепта в строке импорта."""
+
+    name = serializers.CharField(max_length=200)
+    measurement_unit = serializers.CharField(max_length=200)
+    amount = serializers.IntegerField(min_value=1, max_value=5_000)
+
+
+class RecipeImportSerializer(serializers.Serializer):
+    """Проверка строки импорта рецептов (NDJSON) без запросов к базе.
+
+    Автор, теги и ингредиенты указываются естественными ключами и
+    сопоставляются с базой пакетно при сохранении.
+    """
+
+    author = serializers.EmailField()
+    name = serializers.CharField(max_length=200)
+    text = serializers.CharField()
+    cooking_time = serializers.IntegerField(min_value=1, max_value=1_440)
+    image = serializers.CharField(max_length=100)
+    pub_date = serializers.DateTimeField(required=False)
+    tags = serializers.ListField(
+        child=serializers.SlugField(max_length=200), allow_empty=False
+    )
+    ingredients = RecipeImportIngredientSerializer(
+        many=True, allow_empty=False
+    )
+
+    def validate_ingredients(self, ingredients):
+        keys = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for ingredient in ingredients
+        }
+        if len(keys) != len(ingredients):
+            raise serializers.ValidationError(
+                'Ингридиенты не должны дублироваться.'
+            )
+
+        return ingredients
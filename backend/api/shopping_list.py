@@ -0,0 +1,103 @@
+import csv
+import json
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from recipes.models import ShoppingCartIngredient
+
+CHUNK_SIZE = 64 * 1024
+ROWS_CHUNK_SIZE = 2_000
+
+
+def get_shopping_list_rows(user):
+    """Суммарное количество ингредиентов из корзины пользователя.
+
+    Строки читаются из поддерживаемой сигналами таблицы
+    ShoppingCartIngredient порциями, не загружая весь список в память.
+    """
+    return ShoppingCartIngredient.objects.filter(
+        user=user
+    ).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).values_list(
+        'ingredient__name', 'amount', 'ingredient__measurement_unit'
+    ).iterator(chunk_size=ROWS_CHUNK_SIZE)
+
+
+def iter_txt(rows):
+    yield 'Cписок покупок:'
+    for name, amount, measurement_unit in rows:
+        yield f'\n{name} ({measurement_unit}) — {amount}.'
+
+    time = datetime.now().strftime('%d.%m.%Y %H:%M:%S')
+    yield f'\n\nДата создания списка: {time}'
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Ингредиент', 'Единица измерения', 'Количество'])
+    for name, amount, measurement_unit in rows:
+        yield writer.writerow([name, measurement_unit, amount])
+
+
+def iter_json(rows):
+    separator = '['
+    for name, amount, measurement_unit in rows:
+        yield separator + json.dumps({
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        }, ensure_ascii=False, separators=(',', ':'))
+        separator = ','
+
+    yield ']' if separator == ',' else '[]'
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', iter_txt),
+    'csv': ('text/csv; charset=utf-8', iter_csv),
+    'json': ('application/json', iter_json),
+}
+
+
+def join_chunks(parts, size=CHUNK_SIZE):
+    """Объединение мелких строк в блоки байтов размером около size."""
+    buffer = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(buffer).encode()
+            buffer = []
+            length = 0
+
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def get_file_name(export_format):
+    return f'{os.path.splitext(settings.FILE_NAME)[0]}.{export_format}'
+
+
+def make_shopping_list_response(rows, export_format='txt'):
+    content_type, writer = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        join_chunks(writer(rows)), content_type=content_type
+    )
+    response['Content-Disposition'] = content_disposition_header(
+        as_attachment=True, filename=get_file_name(export_format)
+    )
+
+    return response
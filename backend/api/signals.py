@@ -0,0 +1,71 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.cache import CACHE_PREFIX, bump_version
+from recipes.images import variants_ready
+from recipes.models import (Favorites,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            Tag)
+from recipes.signals import is_recipe_deferred
+from users.models import Follow, User
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes_cache(sender, instance, **kwargs):
+    # Строки удаляемого или изменяемого рецепта: версия сменится
+    # в сигнале самого рецепта.
+    if sender is RecipeIngredient and is_recipe_deferred(instance.recipe_id):
+        return
+
+    bump_version(CACHE_PREFIX)
+
+
+@receiver(variants_ready, sender=Recipe)
+def bump_recipes_version(sender, **kwargs):
+    # Ответы с готовыми вариантами ссылаются на другие файлы.
+    bump_version(CACHE_PREFIX)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    bump_version('tags')
+    bump_version(CACHE_PREFIX)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    bump_version('ingredients')
+    bump_version(CACHE_PREFIX)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_users_version(sender, created=False, update_fields=None, **kwargs):
+    # Новый пользователь еще не встречается в ответах, а вход и смена
+    # пароля меняют поля, которые в ответы не попадают.
+    if created or (
+        update_fields and set(update_fields) <= {'last_login', 'password'}
+    ):
+        return
+
+    bump_version('users')
+    bump_version(CACHE_PREFIX)
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_delete, sender=Favorites)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_user_version(sender, instance, **kwargs):
+    bump_version(f'user:{instance.user_id}')
@@ -0,0 +1,524 @@
+import base64
+import io
+import shutil
+import tempfile
+from concurrent.futures import Future
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.db.models import Exists, OuterRef
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.cache import CACHE_PREFIX, get_version
+from api.query_budget import QueryBudgetExceeded
+from api.serializers import RecipeListSerializer
+from api.views import RecipeViewSet
+from recipes import images
+from recipes.cart_totals import find_inconsistencies, refresh_cart_totals
+from recipes.images import mark_variants_ready, schedule_variants
+from recipes.models import (Favorites,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            ShoppingCartIngredient,
+                            Tag)
+from recipes.search import ensure_sqlite_fts
+from users.models import Follow, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2), 'red').save(buffer, 'PNG')
+
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, QUERY_BUDGET_RAISE=True)
+class RecipeAPITestCase(APITestCase):
+    """Общие данные: пользователи, теги, ингредиенты и клиенты.
+
+    Превышение бюджета запросов представлений в тестах - исключение.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author',
+            email='author@foodgram.ru',
+            first_name='Иван',
+            last_name='Петров',
+            password='Foodgram12345'
+        )
+        cls.user = User.objects.create_user(
+            username='user',
+            email='user@foodgram.ru',
+            first_name='Петр',
+            last_name='Иванов',
+            password='Foodgram12345'
+        )
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', color=f'#00000{i}', slug=f'tag_{i}')
+            for i in range(3)
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(10)
+        )
+        cls.image = make_image()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Версии наборов данных и индекс ингредиентов хранятся в кеше,
+        # без очистки число запросов зависело бы от порядка тестов.
+        cache.clear()
+        self.author_client = self.client_class()
+        self.author_client.force_authenticate(self.author)
+        self.user_client = self.client_class()
+        self.user_client.force_authenticate(self.user)
+
+    def get_payload(self, tags, ingredients, **fields):
+        return {
+            'name': 'Борщ',
+            'text': 'Сварить.',
+            'cooking_time': 60,
+            'image': self.image,
+            'tags': [tag.id for tag in tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in ingredients
+            ],
+            **fields,
+        }
+
+    def make_recipes(self, author, count, ingredients):
+        """Рецепты без загрузки картинки, по ingredients ингредиентов."""
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {author.username} {number}',
+                text='Приготовить.',
+                cooking_time=number + 1,
+                image='recipe/images/recipe.png'
+            )
+            recipe.tags.add(*self.tags[:2])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=5
+                )
+                for ingredient in self.ingredients[:ingredients]
+            )
+            recipes.append(recipe)
+
+        return recipes
+
+    def count_queries(self, client, path):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return len(context)
+
+    def create_recipe(self, tags, ingredients, **fields):
+        response = self.author_client.post(
+            '/api/recipes/',
+            self.get_payload(tags, ingredients, **fields),
+            format='json'
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_201_CREATED, response.data
+        )
+
+        return Recipe.objects.get(pk=response.data['id'])
+
+
+class RecipeWriteTests(RecipeAPITestCase):
+    """Число запросов при создании и изменении рецепта."""
+
+    def test_create_query_count(self):
+        payload = self.get_payload(
+            self.tags,
+            [(ingredient, 10) for ingredient in self.ingredients[:4]]
+        )
+
+        with self.assertNumQueries(12):
+            response = self.author_client.post(
+                '/api/recipes/', payload, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_update_touches_only_changed_rows(self):
+        recipe = self.create_recipe(
+            self.tags[:2],
+            [(ingredient, 10) for ingredient in self.ingredients[:4]]
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        payload = self.get_payload(
+            self.tags[1:],
+            [
+                (self.ingredients[0], 20),
+                (self.ingredients[1], 10),
+                (self.ingredients[4], 3),
+            ],
+            text='Сварить и остудить.'
+        )
+        del payload['image']
+
+        with self.assertNumQueries(20):
+            response = self.author_client.patch(
+                f'/api/recipes/{recipe.id}/', payload, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(ShoppingCartIngredient.objects.filter(
+                user=self.user
+            ).values_list('ingredient', 'amount')),
+            {
+                (self.ingredients[0].id, 20),
+                (self.ingredients[1].id, 10),
+                (self.ingredients[4].id, 3),
+            }
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.text, 'Сварить и остудить.')
+
+        # Повторная отправка тех же данных ничего не записывает.
+        with self.assertNumQueries(8):
+            self.author_client.patch(
+                f'/api/recipes/{recipe.id}/', payload, format='json'
+            )
+
+
+class RecipeReadQueryTests(RecipeAPITestCase):
+    """Число запросов на чтение не зависит от размера данных."""
+
+    def test_list_query_count_does_not_depend_on_ingredients(self):
+        recipes = self.make_recipes(self.author, 6, 1)
+        Favorites.objects.create(user=self.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=self.user, recipe=recipes[1])
+
+        with self.assertNumQueries(6):
+            self.user_client.get('/api/recipes/?limit=6')
+
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in self.ingredients[1:]
+        )
+        with self.assertNumQueries(6):
+            response = self.user_client.get('/api/recipes/?limit=6')
+
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(
+            len(response.data['results'][0]['ingredients']),
+            len(self.ingredients)
+        )
+
+    def test_filters_are_validated_once(self):
+        self.make_recipes(self.author, 3, 1)
+        path = (
+            f'/api/recipes/?author={self.author.id}&tags={self.tags[0].slug}'
+        )
+
+        with self.assertNumQueries(8):
+            response = self.user_client.get(path)
+
+        self.assertEqual(response.data['count'], 3)
+
+    def test_retrieve_query_count(self):
+        recipe, = self.make_recipes(self.author, 1, 5)
+
+        with self.assertNumQueries(5):
+            self.user_client.get(f'/api/recipes/{recipe.id}/')
+
+    def test_subscriptions_query_count_does_not_depend_on_authors(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        self.make_recipes(self.author, 4, 2)
+        path = '/api/users/subscriptions/?recipes_limit=2'
+        expected = self.count_queries(self.user_client, path)
+
+        for number in range(3):
+            author = User.objects.create_user(
+                username=f'author_{number}',
+                email=f'author_{number}@foodgram.ru',
+                first_name='Анна',
+                last_name='Сидорова',
+                password='Foodgram12345'
+            )
+            Follow.objects.create(user=self.user, author=author)
+            self.make_recipes(author, 3, 2)
+
+        with self.assertNumQueries(expected):
+            response = self.user_client.get(path)
+
+        self.assertEqual(response.data['count'], 4)
+        for author in response.data['results']:
+            self.assertLessEqual(len(author['recipes']), 2)
+
+
+class CompiledSerializerTests(RecipeAPITestCase):
+    """Скомпилированное представление совпадает с сериализатором DRF."""
+
+    def setUp(self):
+        super().setUp()
+        recipes = self.make_recipes(self.author, 3, 4)
+        self.make_recipes(self.user, 2, 1)
+        Favorites.objects.create(user=self.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=self.user, recipe=recipes[1])
+        Follow.objects.create(user=self.user, author=self.author)
+        self.recipe = recipes[0]
+
+    def get_content(self, client, path, fast):
+        # Ответы в кеше и ETag не зависят от режима сериализации.
+        cache.clear()
+        with override_settings(FAST_SERIALIZATION=fast):
+            response = client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.content
+
+    def test_responses_are_identical(self):
+        paths = [
+            '/api/recipes/',
+            '/api/recipes/?is_favorited=1',
+            f'/api/recipes/{self.recipe.id}/',
+        ]
+        for client in (self.client_class(), self.user_client):
+            for path in paths:
+                with self.subTest(path=path):
+                    self.assertEqual(
+                        self.get_content(client, path, fast=True),
+                        self.get_content(client, path, fast=False)
+                    )
+
+    def test_compiled_matches_serializer(self):
+        response = self.user_client.get('/api/recipes/')
+        request = response.wsgi_request
+        recipes = Recipe.objects.with_related().annotate(
+            is_favorited=Exists(Favorites.objects.filter(
+                user=self.user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=self.user, recipe=OuterRef('pk')
+            ))
+        )
+        serializer = RecipeListSerializer(context={'request': request})
+
+        for recipe in recipes:
+            with self.subTest(recipe=recipe.id):
+                self.assertEqual(
+                    RecipeListSerializer.compiled(recipe, serializer),
+                    super(
+                        RecipeListSerializer, serializer
+                    ).to_representation(recipe)
+                )
+
+
+class QueryBudgetTests(RecipeAPITestCase):
+    """Бюджет проверяется после ответа представления."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe, = self.make_recipes(self.author, 1, 2)
+        self.path = f'/api/recipes/{self.recipe.id}/'
+
+    @mock.patch.dict(RecipeViewSet.query_budgets, {'retrieve': 1})
+    def test_violation_raises_in_strict_mode(self):
+        with self.assertRaisesMessage(
+            QueryBudgetExceeded, 'RecipeViewSet.retrieve: больше 1 запросов'
+        ):
+            self.user_client.get(self.path)
+
+    @mock.patch.dict(RecipeViewSet.query_budgets, {'retrieve': 1})
+    @override_settings(QUERY_BUDGET_RAISE=False, QUERY_BUDGET_SAMPLE_RATE=1)
+    def test_violation_is_logged_otherwise(self):
+        with self.assertLogs('api.query_budget', 'WARNING') as logs:
+            response = self.user_client.get(self.path)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('query_budget_exceeded', logs.output[0])
+
+
+class TagDeletionTests(RecipeAPITestCase):
+    """Удаление тега меняет рецепты, в которых он был указан."""
+
+    def test_recipes_are_touched(self):
+        recipe, = self.make_recipes(self.author, 1, 1)
+        path = f'/api/recipes/{recipe.id}/'
+        updated_at = Recipe.objects.get(pk=recipe.pk).updated_at
+        etag = self.user_client.get(path)['ETag']
+        self.assertEqual(self.client.get(path)['X-Cache'], 'MISS')
+
+        self.tags[0].delete()
+
+        self.assertGreater(
+            Recipe.objects.get(pk=recipe.pk).updated_at, updated_at
+        )
+        response = self.user_client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['tags']), 1)
+        response = self.client.get(path)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['tags']), 1)
+
+
+class AnonymousCacheTests(RecipeAPITestCase):
+    """Ответы анонимным пользователям из кеша не обращаются к базе."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe, = self.make_recipes(self.author, 1, 2)
+
+    def test_cache_hit_makes_no_queries(self):
+        for path in ('/api/recipes/', f'/api/recipes/{self.recipe.id}/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path)['X-Cache'], 'MISS')
+
+                with self.assertNumQueries(0):
+                    response = self.client.get(path)
+                self.assertEqual(response['X-Cache'], 'HIT')
+
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        path, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(
+                    response.status_code, status.HTTP_304_NOT_MODIFIED
+                )
+
+    def test_recipe_change_changes_etag(self):
+        path = f'/api/recipes/{self.recipe.id}/'
+        etag = self.client.get(path)['ETag']
+
+        self.recipe.name = 'Солянка'
+        self.recipe.save()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Солянка')
+
+
+class RecipeSearchTests(RecipeAPITestCase):
+    """Поиск рецептов по названию (?name=) видит изменения рецептов."""
+
+    def search(self, query):
+        response = self.user_client.get('/api/recipes/', {'name': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_created_recipe_is_found(self):
+        recipe = self.create_recipe(
+            self.tags[:1], [(self.ingredients[0], 10)], name='Ёжики R1'
+        )
+
+        self.assertEqual(self.search('R1'), [recipe.id])
+        self.assertEqual(self.search('ежик'), [recipe.id])
+
+    def test_renamed_and_deleted_recipes(self):
+        recipe = self.create_recipe(
+            self.tags[:1], [(self.ingredients[0], 10)], name='Борщ'
+        )
+        payload = self.get_payload(
+            self.tags[:1], [(self.ingredients[0], 10)], name='Солянка'
+        )
+        del payload['image']
+        self.author_client.patch(
+            f'/api/recipes/{recipe.id}/', payload, format='json'
+        )
+
+        self.assertEqual(self.search('Борщ'), [])
+        self.assertEqual(self.search('Солянка'), [recipe.id])
+
+        self.author_client.delete(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(self.search('Солянка'), [])
+
+    def test_lost_triggers_are_restored(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Индекс FTS5 используется только на SQLite.')
+
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER recipes_recipe_fts_insert')
+        recipe, = self.make_recipes(self.author, 1, 1)
+        ensure_sqlite_fts(connection)
+
+        self.assertEqual(self.search(recipe.name), [recipe.id])
+
+
+class ImageVariantsTests(RecipeAPITestCase):
+    """Фоновое создание вариантов картинок рецептов."""
+
+    def test_marking_ready_resets_recipes_cache(self):
+        recipe, = self.make_recipes(self.author, 1, 1)
+        version = get_version(CACHE_PREFIX)
+
+        self.assertEqual(mark_variants_ready([recipe.image.name]), 1)
+        self.assertNotEqual(get_version(CACHE_PREFIX), version)
+
+        version = get_version(CACHE_PREFIX)
+        self.assertEqual(mark_variants_ready([recipe.image.name]), 0)
+        self.assertEqual(get_version(CACHE_PREFIX), version)
+
+    def test_errors_are_logged(self):
+        failed = Future()
+        failed.set_exception(FileNotFoundError('recipe/images/missing.png'))
+
+        with mock.patch.object(
+            images.executor, 'submit', return_value=failed
+        ), self.assertLogs('recipes.images', 'ERROR') as logs:
+            schedule_variants('recipe/images/missing.png')
+
+        self.assertIn('Не удалось создать варианты', logs.output[0])
+
+
+class CartTotalsTests(RecipeAPITestCase):
+    """Суммы ингредиентов корзины и добавление рецепта в корзину."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe, = self.make_recipes(self.author, 1, 3)
+        self.path = f'/api/recipes/{self.recipe.id}/shopping_cart/'
+
+    def test_refresh_updates_rows_in_place(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        ShoppingCartIngredient.objects.filter(user=self.user).update(amount=1)
+        ShoppingCartIngredient.objects.create(
+            user=self.user, ingredient=self.ingredients[5], amount=7
+        )
+
+        refresh_cart_totals([self.user.id])
+
+        self.assertEqual(find_inconsistencies([self.user.id]), {})
+
+    def test_repeated_add_is_rejected(self):
+        response = self.user_client.post(self.path)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.user_client.post(self.path)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(find_inconsistencies([self.user.id]), {})
+
+    def test_totals_error_is_not_reported_as_repeat(self):
+        with mock.patch(
+            'recipes.signals.refresh_cart_totals', side_effect=IntegrityError
+        ), self.assertRaises(IntegrityError):
+            self.user_client.post(self.path)
+
+        self.assertFalse(ShoppingCart.objects.exists())
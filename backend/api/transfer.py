@@ -0,0 +1,197 @@
+import json
+
+from django.db import transaction
+
+from api.cache import CACHE_PREFIX, bump_version
+from api.serializers import RecipeImportSerializer
+from recipes.author_stats import refresh_author_stats
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+EXPORT_CHUNK_SIZE = 500
+IMPORT_BATCH_SIZE = 500
+
+
+def export_recipes(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки NDJSON с рецептами, по одной на рецепт.
+
+    Рецепты читаются iterator() порциями по chunk_size (на PostgreSQL -
+    серверным курсором) вместе с предзагрузкой тегов и ингредиентов,
+    поэтому память не зависит от количества рецептов. Автор, теги и
+    ингредиенты записываются естественными ключами, изображение -
+    путем в хранилище.
+    """
+    if queryset is None:
+        queryset = Recipe.objects.all()
+
+    recipes = queryset.select_related('author').prefetch_related(
+        *Recipe.objects.related_lookups()
+    ).order_by('id')
+
+    for recipe in recipes.iterator(chunk_size=chunk_size):
+        yield json.dumps({
+            'author': recipe.author.email,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'image': recipe.image.name,
+            'pub_date': recipe.pub_date.isoformat(),
+            'tags': [tag.slug for tag in recipe.tags.all()],
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.ingredient.all()
+            ],
+        }, ensure_ascii=False) + '\n'
+
+
+def save_batch(batch, tags):
+    """Сохранение пакета проверенных строк.
+
+    Возвращает список ошибок по строкам и id авторов созданных
+    рецептов.
+    """
+    authors = dict(User.objects.filter(
+        email__in={data['author'] for _, data in batch}
+    ).values_list('email', 'id'))
+    ingredients = {
+        (name, measurement_unit): pk
+        for pk, name, measurement_unit in Ingredient.objects.filter(
+            name__in={
+                ingredient['name']
+                for _, data in batch for ingredient in data['ingredients']
+            }
+        ).values_list('id', 'name', 'measurement_unit')
+    }
+    existing = set(Recipe.objects.filter(
+        author__in=authors.values(),
+        name__in={data['name'] for _, data in batch}
+    ).values_list('author', 'name'))
+
+    errors = []
+    valid = []
+    for number, data in batch:
+        line_errors = {}
+        author_id = authors.get(data['author'])
+        if author_id is None:
+            line_errors['author'] = f'Пользователь {data["author"]} не найден.'
+        elif (author_id, data['name']) in existing:
+            line_errors['name'] = 'Рецепт с таким названием уже существует.'
+        unknown_tags = [slug for slug in data['tags'] if slug not in tags]
+        if unknown_tags:
+            line_errors['tags'] = f'Неизвестные теги: {unknown_tags}.'
+        unknown_ingredients = [
+            f'{ingredient["name"]} ({ingredient["measurement_unit"]})'
+            for ingredient in data['ingredients']
+            if (ingredient['name'], ingredient['measurement_unit'])
+            not in ingredients
+        ]
+        if unknown_ingredients:
+            line_errors['ingredients'] = (
+                f'Неизвестные ингредиенты: {unknown_ingredients}.'
+            )
+
+        if line_errors:
+            errors.append({'line': number, 'errors': line_errors})
+        else:
+            existing.add((author_id, data['name']))
+            valid.append((author_id, data))
+
+    with transaction.atomic():
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author_id=author_id,
+                name=data['name'],
+                text=data['text'],
+                cooking_time=data['cooking_time'],
+                image=data['image'],
+            )
+            for author_id, data in valid
+        )
+        # pub_date заполняется auto_now_add, исходная дата переносится
+        # отдельным обновлением.
+        dated = []
+        for recipe, (_, data) in zip(recipes, valid):
+            if 'pub_date' in data:
+                recipe.pub_date = data['pub_date']
+                dated.append(recipe)
+        Recipe.objects.bulk_update(dated, ['pub_date'])
+
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[slug])
+            for recipe, (_, data) in zip(recipes, valid)
+            for slug in set(data['tags'])
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[
+                    ingredient['name'], ingredient['measurement_unit']
+                ],
+                amount=ingredient['amount'],
+            )
+            for recipe, (_, data) in zip(recipes, valid)
+            for ingredient in data['ingredients']
+        )
+
+    return errors, {author_id for author_id, _ in valid}
+
+
+def import_recipes(lines, batch_size=IMPORT_BATCH_SIZE):
+    """Импорт рецептов из строк NDJSON пакетами по batch_size.
+
+    Генератор событий: {'line': n, 'errors': {...}} для каждой
+    отклоненной строки, {'processed': n, 'created': m} после каждого
+    пакета и итоговое {'processed', 'created', 'failed'} в конце.
+    Каждый пакет сохраняется в своей транзакции массовыми запросами,
+    поэтому сигналы не отправляются: версия кеша рецептов и статистика
+    авторов обновляются явно.
+    """
+    tags = dict(Tag.objects.values_list('slug', 'id'))
+    batch = []
+    processed = 0
+    created = 0
+    failed = 0
+
+    def flush():
+        nonlocal created, failed
+        errors, authors = save_batch(batch, tags)
+        if authors:
+            bump_version(CACHE_PREFIX)
+            refresh_author_stats(authors)
+        created += len(batch) - len(errors)
+        failed += len(errors)
+        batch.clear()
+
+        return errors
+
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode()
+        if not line.strip():
+            continue
+        processed += 1
+
+        try:
+            serializer = RecipeImportSerializer(data=json.loads(line))
+        except ValueError as error:
+            failed += 1
+            yield {'line': number, 'errors': {'json': str(error)}}
+            continue
+        if not serializer.is_valid():
+            failed += 1
+            yield {'line': number, 'errors': serializer.errors}
+            continue
+
+        batch.append((number, serializer.validated_data))
+        if len(batch) >= batch_size:
+            yield from flush()
+            yield {'processed': processed, 'created': created}
+
+    if batch:
+        yield from flush()
+    yield {'processed': processed, 'created': created, 'failed': failed}
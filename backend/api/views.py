@@ -1,23 +1,43 @@
-from datetime import datetime
-
-from django.conf import settings
-from django.db import IntegrityError
-from django.db.models import Sum, Count
+import json
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import (BooleanField,
+                              Count,
+                              Exists,
+                              Max,
+                              OuterRef,
+                              Value,
+                              prefetch_related_objects)
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse, Http404
+from django.http import Http404, StreamingHttpResponse
+from django.utils.http import content_disposition_header
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
 from rest_framework.mixins import (CreateModelMixin,
                                    ListModelMixin,
                                    RetrieveModelMixin)
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (AllowAny,
+                                        IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import (GenericViewSet,
                                      ModelViewSet)
 
-from api.filters import RecipeFilter
-from api.pagination import CustomPaginator
+from api.cache import (cache_anonymous_response,
+                       get_version,
+                       get_version_datetime)
+from api.catalogue import get_buffered_response, is_buffered
+from api.conditional import (CatalogueConditionalMixin,
+                             conditional_response,
+                             get_generation_validators,
+                             get_user_stamp,
+                             make_etag)
+from api.filters import RecipeFilter, RecipeSearchFilter
+from api.ingredient_index import get_index
+from api.pagination import CustomPaginator, RecipeCursorPaginator
+from api.query_budget import QueryBudgetMixin
 from api.permissions import IsAuthorOrReadOnlyPermission
 from api.serializers import (AuthorSerializer,
                              IngredientSerializer,
@@ -26,19 +46,29 @@ from api.serializers import (AuthorSerializer,
                              RecipeCreateSerializer,
                              RecipeListSerializer,
                              SetPasswordSerializer,
+                             ShoppingCartIngredientSerializer,
                              TagSerializer,
                              UserListSerializer,
                              UserCreateSerializer)
+from api.shopping_list import (EXPORT_FORMATS,
+                               get_shopping_list_rows,
+                               join_chunks,
+                               make_shopping_list_response)
+from api.transfer import (IMPORT_BATCH_SIZE,
+                          NDJSON_CONTENT_TYPE,
+                          export_recipes,
+                          import_recipes)
 from recipes.models import (Ingredient,
                             Favorites,
                             Recipe,
-                            RecipeIngredient,
                             ShoppingCart,
+                            ShoppingCartIngredient,
                             Tag)
 from users.models import Follow, User
 
 
-class UserViewSet(CreateModelMixin,
+class UserViewSet(QueryBudgetMixin,
+                  CreateModelMixin,
                   ListModelMixin,
                   RetrieveModelMixin,
                   GenericViewSet):
@@ -47,6 +77,16 @@ class UserViewSet(CreateModelMixin,
     queryset = User.objects.all()
     permission_classes = [AllowAny]
     pagination_class = CustomPaginator
+    # Наихудшие измеренные значения с аутентификацией по токену.
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'create': 6,
+        'me': 1,
+        'set_password': 2,
+        'subscriptions': 4,
+        'subscribe': 7,
+    }
 
     def get_serializer_class(self):
 
@@ -96,14 +136,21 @@ class UserViewSet(CreateModelMixin,
     def subscriptions(self, request):
         queryset = User.objects.filter(
             following__user=request.user
-        ).annotate(
-            recipes_count=Count('recipes')
+        ).select_related(
+            'stats'
+        ).prefetch_related(
+            AuthorSerializer.recipes_prefetch(request)
         )
 
         page = self.paginate_queryset(queryset)
 
         serializer = AuthorSerializer(
-            page, many=True, context={'request': request}
+            page,
+            many=True,
+            context={
+                'request': request,
+                'subscriptions': {author.id for author in page}
+            }
         )
 
         return self.get_paginated_response(serializer.data)
@@ -137,6 +184,9 @@ class UserViewSet(CreateModelMixin,
                     status=status.HTTP_400_BAD_REQUEST
                 )
             else:
+                prefetch_related_objects(
+                    [author], FollowAuthorSerializer.recipes_prefetch(request)
+                )
                 return Response(
                     serializer.data, status=status.HTTP_201_CREATED
                 )
@@ -158,40 +208,109 @@ class UserViewSet(CreateModelMixin,
             )
 
 
-class IngredientViewSet(ListModelMixin,
+class IngredientViewSet(CatalogueConditionalMixin,
+                        ListModelMixin,
                         RetrieveModelMixin,
                         GenericViewSet):
     """Представление ингредиентов."""
 
+    catalogue = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
     pagination_class = None
-    filter_backends = [SearchFilter]
-    search_fields = ['^name']
 
+    def get_catalogue_data(self):
+        return get_index().items
+
+    @conditional_response('get_catalogue_validators')
+    def list(self, request, *args, **kwargs):
+        if is_buffered(self, request):
+            return get_buffered_response(self, request)
+
+        limit = request.query_params.get('limit')
+
+        if limit is not None:
+            if not limit.isdigit() or int(limit) < 1:
+                return Response(
+                    {'errors': 'limit должен быть положительным числом.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            limit = int(limit)
 
-class TagViewSet(ListModelMixin,
+        return Response(get_index().search(
+            request.query_params.get(api_settings.SEARCH_PARAM, ''), limit
+        ))
+
+
+class TagViewSet(CatalogueConditionalMixin,
+                 ListModelMixin,
                  RetrieveModelMixin,
                  GenericViewSet):
     """Представление тегов."""
 
+    catalogue = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [AllowAny]
     pagination_class = None
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(QueryBudgetMixin, ModelViewSet):
     """Представление рецептов."""
 
-    queryset = Recipe.objects.select_related(
-        'author').prefetch_related('tags', 'ingredients')
+    queryset = Recipe.objects.with_related()
     permission_classes = [IsAuthorOrReadOnlyPermission]
     pagination_class = CustomPaginator
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, RecipeSearchFilter]
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'delete', 'create']
+    # Наихудшие измеренные значения с аутентификацией по токену: создание
+    # первого рецепта автора, замена тегов и состава рецепта в корзинах,
+    # удаление рецепта из избранного и корзин.
+    query_budgets = {
+        'list': 8,
+        'retrieve': 6,
+        'create': 11,
+        'partial_update': 19,
+        'destroy': 19,
+        'favorite': 7,
+        'shopping_cart': 10,
+        'download_shopping_cart': 1,
+        'shopping_cart_summary': 3,
+        'export_ndjson': 1,
+    }
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+
+        return super().initialize_request(request, *args, **kwargs)
+
+    @property
+    def paginator(self):
+        if (not hasattr(self, '_paginator')
+                and RecipeCursorPaginator.is_requested(self.request)):
+            self._paginator = RecipeCursorPaginator()
+
+        return super().paginator
+
+    def get_queryset(self):
+        user = self.request.user
+
+        if user.is_anonymous:
+            return self.queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+
+        return self.queryset.annotate(
+            is_favorited=Exists(
+                Favorites.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+        )
 
     def get_serializer_class(self):
 
@@ -200,6 +319,79 @@ class RecipeViewSet(ModelViewSet):
 
         return RecipeCreateSerializer
 
+    def get_list_queryset(self):
+        """Отфильтрованный список; фильтры проверяются один раз.
+
+        Тот же queryset используют валидаторы условного GET и сам ответ.
+        """
+        if not hasattr(self, '_list_queryset'):
+            self._list_queryset = self.filter_queryset(self.get_queryset())
+
+        return self._list_queryset
+
+    def get_list_validators(self, request, *args, **kwargs):
+        if request.user.is_anonymous:
+            return get_generation_validators(request, self.action)
+
+        stamp = self.get_list_queryset().aggregate(
+            last_modified=Max('updated_at'),
+            count=Count('id')
+        )
+        user_stamp, _ = get_user_stamp(request)
+
+        # Ответ содержит данные авторов, их изменения меняют версию users.
+        return make_etag(
+            stamp['last_modified'],
+            stamp['count'],
+            get_version('users'),
+            user_stamp,
+            request.query_params.urlencode(),
+            request.accepted_media_type,
+        ), None
+
+    def get_detail_validators(self, request, pk=None, **kwargs):
+        if request.user.is_anonymous:
+            return get_generation_validators(request, self.action, pk)
+
+        try:
+            updated_at = Recipe.objects.filter(pk=pk).values_list(
+                'updated_at', flat=True
+            ).first()
+        except ValueError:
+            updated_at = None
+
+        if updated_at is None:
+            return None, None
+
+        user_stamp, user_modified = get_user_stamp(request)
+        users_modified = get_version_datetime('users')
+
+        return make_etag(
+            pk,
+            updated_at,
+            get_version('users'),
+            user_stamp,
+            request.accepted_media_type,
+        ), max(updated_at, users_modified, user_modified or updated_at)
+
+    @conditional_response('get_list_validators')
+    @cache_anonymous_response
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_list_queryset()
+        page = self.paginate_queryset(queryset)
+
+        if page is None:
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        serializer = self.get_serializer(page, many=True)
+
+        return self.get_paginated_response(serializer.data)
+
+    @conditional_response('get_detail_validators')
+    @cache_anonymous_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -286,8 +478,17 @@ class RecipeViewSet(ModelViewSet):
             serializer.is_valid(raise_exception=True)
 
             try:
-                ShoppingCart.objects.create(user=request.user, recipe=recipe)
+                with transaction.atomic():
+                    ShoppingCart.objects.create(
+                        user=request.user, recipe=recipe
+                    )
             except IntegrityError:
+                # В create() входят и сигналы пересчета корзины: повтором
+                # считается только нарушение уникальности самой строки.
+                if not recipe.shoppingcart.filter(
+                    user=request.user
+                ).exists():
+                    raise
                 return Response(
                     {'errors': 'Рецепт уже есть в списке продуктов.'},
                     status=status.HTTP_400_BAD_REQUEST
@@ -313,24 +514,15 @@ class RecipeViewSet(ModelViewSet):
                 status=status.HTTP_204_NO_CONTENT
             )
 
-    def create_file_txt_for_download(self, ingredients):
-        formatted_list_ingredients = [
-            f'{ingredient[0]} ({ingredient[2]}) — {ingredient[1]}.'
-            for ingredient in ingredients
-        ]
-        now = datetime.now()
-        time = now.strftime('%d.%m.%Y %H:%M:%S')
-
-        text_for_download = 'Cписок покупок:\n' + '\n'.join(
-            formatted_list_ingredients
-        ) + f'\n\nДата создания списка: {time}'
-
-        return FileResponse(
-            text_for_download,
-            as_attachment=True,
-            filename=settings.FILE_NAME,
-            headers={'Content-Type': 'text/plain'}
-        )
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр format выгрузки совпадает с URL_FORMAT_OVERRIDE,
+        # а NDJSON отдается и принимается без рендереров и парсеров DRF.
+        if self.action in ('download_shopping_cart',
+                           'export_ndjson',
+                           'import_ndjson'):
+            force = True
+
+        return super().perform_content_negotiation(request, force)
 
     @action(
         detail=False,
@@ -338,16 +530,72 @@ class RecipeViewSet(ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request, **kwargs):
-        ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__shoppingcart__user=request.user
-            ).values('ingredient').annotate(
-                total_amount=Sum('amount')
-            ).values_list(
-                'ingredient__name',
-                'total_amount',
-                'ingredient__measurement_unit'
+        export_format = request.query_params.get('format', 'txt')
+
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'errors': 'Доступные форматы: '
+                           f'{", ".join(EXPORT_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+
+        return make_shopping_list_response(
+            get_shopping_list_rows(request.user), export_format
         )
 
-        return self.create_file_txt_for_download(ingredients)
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAdminUser],
+        url_path='export'
+    )
+    def export_ndjson(self, request, **kwargs):
+        response = StreamingHttpResponse(
+            join_chunks(export_recipes()), content_type=NDJSON_CONTENT_TYPE
+        )
+        response['Content-Disposition'] = content_disposition_header(
+            as_attachment=True, filename='recipes.ndjson'
+        )
+
+        return response
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAdminUser],
+        url_path='import'
+    )
+    def import_ndjson(self, request, **kwargs):
+        batch_size = request.query_params.get('batch_size', '')
+        batch_size = (
+            int(batch_size) if batch_size.isdigit() and int(batch_size)
+            else IMPORT_BATCH_SIZE
+        )
+        lines = iter(request.stream.readline, b'') if request.stream else []
+        events = import_recipes(lines, batch_size)
+
+        return StreamingHttpResponse(
+            (json.dumps(event, ensure_ascii=False) + '\n' for event in events),
+            content_type=NDJSON_CONTENT_TYPE
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_summary(self, request, **kwargs):
+        ingredients = ShoppingCartIngredient.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by(
+            'ingredient__name', 'ingredient__measurement_unit'
+        )
+
+        return Response({
+            'recipes_count': ShoppingCart.objects.filter(
+                user=request.user
+            ).count(),
+            'ingredients': ShoppingCartIngredientSerializer(
+                ingredients, many=True
+            ).data,
+        })
@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -31,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -113,6 +115,11 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
@@ -129,6 +136,14 @@ REST_FRAMEWORK = {
     'SEARCH_PARAM': 'name',
 }
 
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'api.renderers.MessagePackRenderer'
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append(
+        'api.parsers.MessagePackParser'
+    )
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SERIALIZERS': {
@@ -139,6 +154,30 @@ DJOSER = {
     },
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+RECIPES_CACHE_TTL = int(os.getenv('RECIPES_CACHE_TTL', 60))
+
+FAST_SERIALIZATION = os.getenv('FAST_SERIALIZATION', 'False') == 'True'
+
+IMAGE_VARIANTS_WORKERS = int(os.getenv('IMAGE_VARIANTS_WORKERS', 2))
+
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', 'False') == 'True'
+
+REQUEST_TIMING_BUDGET_MS = int(os.getenv('REQUEST_TIMING_BUDGET_MS', 500))
+
+# В режиме отладки и в тестах превышение бюджета запросов - исключение,
+# в production нарушения выборочно пишутся в лог.
+QUERY_BUDGET_RAISE = os.getenv('QUERY_BUDGET_RAISE', DEBUG) == 'True'
+
+QUERY_BUDGET_SAMPLE_RATE = float(os.getenv('QUERY_BUDGET_SAMPLE_RATE', 0.01))
+
+QUERY_BUDGET_REPEATS = int(os.getenv('QUERY_BUDGET_REPEATS', 3))
+
 FILE_NAME = 'ShoppingСart.txt'
 
 CORS_URLS_REGEX = r'^/api/.*$'
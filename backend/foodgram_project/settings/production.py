@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 
 import sentry_sdk
 from django.conf import settings
@@ -22,10 +23,22 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', '/tmp/foodgram_cache'),
+    }
+}
+
 settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
-    'rest_framework.renderers.JSONRenderer',
+    'api.renderers.FastJSONRenderer',
 ]
 
+if find_spec('msgpack'):
+    settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'api.renderers.MessagePackRenderer'
+    )
+
 sentry_sdk.init(
     dsn=('https://cf824c317dfa948ab6e82843a6b8304f@o4505985247150080.'
          + 'ingest.sentry.io/4506231236198400'),
@@ -5,3 +5,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_project.settings')
 
 application = get_wsgi_application()
+
+from api.ingredient_index import preload_index  # noqa: E402
+
+preload_index()
@@ -1,4 +1,12 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+from recipes.search import ensure_sqlite_fts
+
+
+def ensure_search_index(sender, using, **kwargs):
+    ensure_sqlite_fts(connections[using])
 
 
 class RecipesConfig(AppConfig):
@@ -6,3 +14,10 @@ class RecipesConfig(AppConfig):
     name = 'recipes'
     verbose_name = 'Рецепт'
     verbose_name_plural = 'Рецепты'
+
+    def ready(self):
+        from recipes import signals  # noqa: F401
+
+        # Триггеры FTS5 на SQLite не переживают пересоздание таблицы
+        # рецептов в последующих миграциях.
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,90 @@
+from django.db.models import Count, F
+
+from recipes.models import AuthorStats, Favorites, Recipe
+from users.models import Follow
+
+STATS_FIELDS = ['recipes_count', 'followers_count', 'favorites_count']
+
+
+def count_by_author(queryset, author_field, authors):
+    return dict(
+        queryset.filter(
+            **{f'{author_field}__in': authors}
+        ).values(author_field).annotate(
+            total=Count('pk')
+        ).order_by().values_list(author_field, 'total')
+    )
+
+
+def calculate_author_stats(authors):
+    """Счетчики авторов, посчитанные по исходным таблицам."""
+    authors = list(authors)
+    recipes = count_by_author(Recipe.objects.all(), 'author', authors)
+    followers = count_by_author(Follow.objects.all(), 'author', authors)
+    favorites = count_by_author(
+        Favorites.objects.all(), 'recipe__author', authors
+    )
+
+    return [
+        AuthorStats(
+            author_id=author_id,
+            recipes_count=recipes.get(author_id, 0),
+            followers_count=followers.get(author_id, 0),
+            favorites_count=favorites.get(author_id, 0),
+        )
+        for author_id in authors
+    ]
+
+
+def refresh_author_stats(authors):
+    """Пересчет и сохранение счетчиков авторов.
+
+    Записываются только изменившиеся значения и недостающие записи
+    (например, у пользователей, созданных массовой вставкой).
+    Возвращает количество изменений.
+    """
+    stats = calculate_author_stats(authors)
+    stored = {
+        row[0]: row[1:]
+        for row in AuthorStats.objects.filter(
+            author__in=[item.author_id for item in stats]
+        ).values_list('author', *STATS_FIELDS)
+    }
+    changed = [
+        item for item in stats
+        if stored.get(item.author_id) != tuple(
+            getattr(item, field) for field in STATS_FIELDS
+        )
+    ]
+    AuthorStats.objects.bulk_create(
+        changed,
+        update_conflicts=True,
+        unique_fields=['author'],
+        update_fields=STATS_FIELDS
+    )
+
+    return len(changed)
+
+
+def change_author_stats(author_id, field, delta):
+    """Атомарное изменение счетчика автора выражением F().
+
+    Запись создается вместе с пользователем; при каскадном удалении
+    автора ее уже нет, и изменение пропускается.
+    """
+    AuthorStats.objects.filter(author=author_id).update(
+        **{field: F(field) + delta}
+    )
+
+
+def create_missing_author_stats(users):
+    """Нулевые записи статистики для пользователей без нее."""
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(author_id=user_id)
+            for user_id in users.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True
+    )
@@ -0,0 +1,123 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Sum
+
+from recipes.models import (RecipeIngredient,
+                            ShoppingCart,
+                            ShoppingCartIngredient)
+
+
+def get_cart_totals(users=None, ingredients=None):
+    """Суммы ингредиентов по корзинам, посчитанные по исходным таблицам.
+
+    Возвращает словарь {(user_id, ingredient_id): amount}. Заданные
+    users/ingredients ограничивают расчет соответствующими id.
+    """
+    # Условия на корзину задаются одним filter(), чтобы использовать
+    # одно соединение с ShoppingCart и не задваивать суммы.
+    queryset = RecipeIngredient.objects.filter(
+        recipe__shoppingcart__user__in=users
+    ) if users is not None else RecipeIngredient.objects.filter(
+        recipe__shoppingcart__isnull=False
+    )
+    if ingredients is not None:
+        queryset = queryset.filter(ingredient__in=ingredients)
+
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in queryset.values(
+            'recipe__shoppingcart__user', 'ingredient'
+        ).annotate(
+            total=Sum('amount')
+        ).order_by().values_list(
+            'recipe__shoppingcart__user', 'ingredient', 'total'
+        )
+    }
+
+
+def refresh_cart_totals(users=None, ingredients=None, batch_size=None):
+    """Пересчет затронутых строк ShoppingCartIngredient в одной транзакции.
+
+    users и ingredients - коллекции id; None означает все записи.
+    Суммы записываются через INSERT ... ON CONFLICT, поэтому
+    параллельные пересчеты одной корзины не нарушают уникальность
+    (user, ingredient), а удаляются только строки без рецептов в корзине.
+    """
+    if users is not None:
+        users = list(users)
+        if not users:
+            return
+    if ingredients is not None:
+        ingredients = list(ingredients)
+        if not ingredients:
+            return
+
+    stale = ShoppingCartIngredient.objects.exclude(Exists(
+        RecipeIngredient.objects.filter(
+            recipe__shoppingcart__user=OuterRef('user'),
+            ingredient=OuterRef('ingredient')
+        )
+    ))
+    if users is not None:
+        stale = stale.filter(user__in=users)
+    if ingredients is not None:
+        stale = stale.filter(ingredient__in=ingredients)
+
+    # Внутри транзакции вызывающего кода (удаление рецепта, добавление
+    # в корзину) точка сохранения не нужна: ошибка откатывает все.
+    with transaction.atomic(savepoint=False):
+        totals = get_cart_totals(users, ingredients)
+        stale.delete()
+        ShoppingCartIngredient.objects.bulk_create(
+            (
+                ShoppingCartIngredient(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=amount
+                )
+                for (user_id, ingredient_id), amount in totals.items()
+            ),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['user', 'ingredient'],
+            update_fields=['amount']
+        )
+
+
+def refresh_recipe_cart_totals(recipe, ingredients=None):
+    """Пересчет корзин, в которых лежит рецепт.
+
+    Используется после массовых операций над RecipeIngredient, которые
+    не отправляют сигналы. ingredients - затронутые ингредиенты, по
+    умолчанию все ингредиенты рецепта.
+    """
+    users = list(ShoppingCart.objects.filter(
+        recipe=recipe
+    ).values_list('user', flat=True))
+
+    if not users:
+        return
+
+    if ingredients is None:
+        ingredients = RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient', flat=True)
+
+    refresh_cart_totals(users, ingredients)
+
+
+def find_inconsistencies(users=None):
+    """Расхождения таблицы с расчетом: {(user, ingredient): (было, надо)}."""
+    stored = ShoppingCartIngredient.objects.all()
+    if users is not None:
+        stored = stored.filter(user__in=users)
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in stored.values_list(
+            'user', 'ingredient', 'amount'
+        )
+    }
+    expected = get_cart_totals(users)
+
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key) != expected.get(key)
+    }
@@ -0,0 +1,152 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+
+IMAGE_VARIANTS = {
+    'card': {'size': (480, 480), 'format': 'JPEG', 'extension': 'jpg'},
+    'card_webp': {'size': (480, 480), 'format': 'WEBP', 'extension': 'webp'},
+    'detail': {'size': (1200, 1200), 'format': 'JPEG', 'extension': 'jpg'},
+    'detail_webp': {
+        'size': (1200, 1200), 'format': 'WEBP', 'extension': 'webp'
+    },
+}
+VARIANTS_DIR = 'variants'
+QUALITY = 82
+
+logger = logging.getLogger(__name__)
+
+# Отправляется после отметки рецептов с готовыми вариантами картинок.
+variants_ready = Signal()
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_VARIANTS_WORKERS,
+    thread_name_prefix='image-variants'
+)
+
+
+def get_variant_name(name, variant):
+    """Путь варианта: recipe/images/variants/<имя>_<вариант>.<расш>."""
+    directory, filename = os.path.split(name)
+    stem, _ = os.path.splitext(filename)
+
+    return os.path.join(
+        directory,
+        VARIANTS_DIR,
+        f'{stem}_{variant}.{IMAGE_VARIANTS[variant]["extension"]}'
+    )
+
+
+def get_missing_variants(name):
+    return [
+        variant for variant in IMAGE_VARIANTS
+        if not default_storage.exists(get_variant_name(name, variant))
+    ]
+
+
+def render_variant(image, variant):
+    options = IMAGE_VARIANTS[variant]
+    result = image.copy()
+    result.thumbnail(options['size'], Image.LANCZOS)
+
+    if options['format'] == 'JPEG' and result.mode != 'RGB':
+        background = Image.new('RGB', result.size, 'white')
+        if result.mode in ('RGBA', 'LA', 'P'):
+            result = result.convert('RGBA')
+            background.paste(result, mask=result.getchannel('A'))
+        else:
+            background.paste(result.convert('RGB'))
+        result = background
+
+    buffer = io.BytesIO()
+    result.save(
+        buffer, format=options['format'], quality=QUALITY, optimize=True
+    )
+
+    return buffer.getvalue()
+
+
+def generate_variants(name, force=False):
+    """Создание недостающих вариантов изображения рецепта.
+
+    Возвращает количество созданных файлов.
+    """
+    variants = list(IMAGE_VARIANTS) if force else get_missing_variants(name)
+    if not name or not variants:
+        return 0
+
+    with default_storage.open(name, 'rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+
+    for variant in variants:
+        variant_name = get_variant_name(name, variant)
+        if default_storage.exists(variant_name):
+            default_storage.delete(variant_name)
+        default_storage.save(
+            variant_name, ContentFile(render_variant(image, variant))
+        )
+
+    return len(variants)
+
+
+def mark_variants_ready(names):
+    """Отметка рецептов с готовыми вариантами картинок.
+
+    Вместе с флагом меняется updated_at, а сигнал variants_ready
+    позволяет сбросить закешированные ответы со ссылками на оригинал.
+    """
+    updated = Recipe.objects.filter(
+        image__in=names, image_variants_ready=False
+    ).update(image_variants_ready=True, updated_at=timezone.now())
+    if updated:
+        variants_ready.send(sender=Recipe, names=names)
+
+    return updated
+
+
+def generate_and_mark(name):
+    try:
+        generate_variants(name)
+        mark_variants_ready([name])
+    finally:
+        connections.close_all()
+
+
+def log_variants_error(future):
+    error = future.exception()
+    if error is not None:
+        logger.error(
+            'Не удалось создать варианты картинки',
+            exc_info=(type(error), error, error.__traceback__)
+        )
+
+
+def schedule_variants(name):
+    future = executor.submit(generate_and_mark, name)
+    future.add_done_callback(log_variants_error)
+
+    return future
+
+
+def get_variant_urls(name, ready):
+    """Ссылки на варианты без обращений к хранилищу.
+
+    Пока варианты не созданы (ready=False), все ссылки ведут на оригинал.
+    """
+    return {
+        variant: default_storage.url(
+            get_variant_name(name, variant) if ready else name
+        )
+        for variant in IMAGE_VARIANTS
+    }
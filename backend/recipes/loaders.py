@@ -0,0 +1,27 @@
+import csv
+import json
+import os
+
+
+def read_rows(path, fields):
+    """Строки справочника из CSV (без заголовка) или JSON-списка объектов.
+
+    Возвращает кортежи значений в порядке fields без повторов.
+    """
+    with open(file=path, mode='r', encoding='utf-8') as f:
+        if os.path.splitext(path)[1].lower() == '.json':
+            rows = (
+                tuple(item[field] for field in fields)
+                for item in json.load(f)
+            )
+        else:
+            rows = (
+                tuple(row[:len(fields)]) for row in csv.reader(f) if row
+            )
+
+        return list(dict.fromkeys(rows))
+
+
+def batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.cart_totals import find_inconsistencies, refresh_cart_totals
+
+
+class Command(BaseCommand):
+    help = 'Check per-user shopping cart totals against the cart contents.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rebuild totals of users with inconsistencies.'
+        )
+
+    def handle(self, *args, **options):
+        inconsistencies = find_inconsistencies()
+
+        if not inconsistencies:
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено.'))
+            return
+
+        for (user, ingredient), (stored, expected) in sorted(
+            inconsistencies.items()
+        ):
+            self.stdout.write(self.style.ERROR(
+                f'Пользователь {user}, ингредиент {ingredient}: '
+                f'в таблице {stored}, должно быть {expected}'
+            ))
+
+        users = {user for user, _ in inconsistencies}
+        if not options['fix']:
+            raise CommandError(
+                f'Найдено расхождений: {len(inconsistencies)} '
+                f'у пользователей: {len(users)}'
+            )
+
+        refresh_cart_totals(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлены корзины пользователей: {len(users)}'
+        ))
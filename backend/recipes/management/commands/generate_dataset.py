@@ -0,0 +1,300 @@
+import random
+import time
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import CACHE_PREFIX, bump_version
+from recipes.loaders import batches
+from recipes.models import (Favorites,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            Tag)
+from users.models import Follow, User
+
+FIRST_NAMES = [
+    'Анна', 'Иван', 'Мария', 'Петр', 'Ольга', 'Сергей', 'Елена',
+    'Дмитрий', 'Наталья', 'Алексей', 'Татьяна', 'Андрей',
+]
+LAST_NAMES = [
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров',
+    'Соколов', 'Михайлов', 'Новиков', 'Федоров', 'Морозов', 'Волков',
+]
+DISHES = [
+    'Салат', 'Суп', 'Пирог', 'Каша', 'Запеканка', 'Омлет', 'Рагу',
+    'Паста', 'Борщ', 'Плов', 'Блины', 'Котлеты', 'Пицца', 'Десерт',
+]
+GRAMS = [50, 100, 150, 200, 250, 300, 400, 500]
+PUB_DATE_SPREAD_DAYS = 365
+
+
+def zipf_cum_weights(size, exponent):
+    """Накопленные веса степенного распределения: вес ранга r = r^-s."""
+    return list(accumulate(rank ** -exponent for rank in range(1, size + 1)))
+
+
+def sample_pairs(rng, left, right, count, exponent, exclude_same=False):
+    """Уникальные пары (left, right), оба элемента - по популярности.
+
+    Первые элементы списков самые популярные. Генерация прекращается,
+    если несколько раундов подряд не дают новых пар.
+    """
+    left_weights = zipf_cum_weights(len(left), exponent)
+    right_weights = zipf_cum_weights(len(right), exponent)
+    pairs = set()
+    idle_rounds = 0
+
+    while len(pairs) < count and idle_rounds < 5:
+        size = len(pairs)
+        # Маленькие доборы почти целиком попадают в уже выбранные
+        # популярные пары, поэтому раунд не бывает меньше тысячи.
+        need = max(count - size, 1_000)
+        pairs.update(
+            pair for pair in zip(
+                rng.choices(left, cum_weights=left_weights, k=need),
+                rng.choices(right, cum_weights=right_weights, k=need)
+            )
+            if not exclude_same or pair[0] != pair[1]
+        )
+        idle_rounds = idle_rounds + 1 if len(pairs) == size else 0
+
+    return list(islice(pairs, count))
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible synthetic dataset of production scale.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--recipes', type=int, default=10_000)
+        parser.add_argument('--follows', type=int, default=20_000)
+        parser.add_argument('--favorites', type=int, default=100_000)
+        parser.add_argument('--carts', type=int, default=10_000)
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed, the same seed gives the same dataset.'
+        )
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.1,
+            help='Exponent of the power-law popularity distribution.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5_000,
+            help='Number of rows inserted with one bulk_create.'
+        )
+        parser.add_argument(
+            '--prefix',
+            default='dataset',
+            help='Prefix of generated usernames and emails.'
+        )
+        parser.add_argument(
+            '--password',
+            default='Foodgram-dataset-1',
+            help='Password of all generated users.'
+        )
+
+    def insert(self, model, objects):
+        """Вставка объектов из итератора порциями в одной транзакции."""
+        objects = iter(objects)
+        count = 0
+        with transaction.atomic():
+            while True:
+                chunk = list(islice(objects, self.batch_size))
+                if not chunk:
+                    break
+                model.objects.bulk_create(chunk)
+                count += len(chunk)
+
+        return count
+
+    def stage(self, name, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.stdout.write(
+            f'{name}: {result if isinstance(result, int) else len(result)} '
+            f'за {time.perf_counter() - start:.2f} с'
+        )
+
+        return result
+
+    def create_users(self, count, prefix, password):
+        # Хеш пароля считается один раз: PBKDF2 на каждого пользователя
+        # занял бы больше времени, чем вся остальная генерация.
+        password_hash = make_password(password)
+        self.insert(User, (
+            User(
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@foodgram.ru',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                password=password_hash,
+            )
+            for number in range(count)
+        ))
+
+        users = list(User.objects.filter(
+            username__startswith=prefix, email__endswith='@foodgram.ru'
+        ).order_by('id').values_list('id', flat=True))
+        self.rng.shuffle(users)
+
+        return users
+
+    def create_recipes(self, count, authors, ingredients, tags):
+        authors_weights = zipf_cum_weights(len(authors), self.exponent)
+        self.insert(Recipe, (
+            Recipe(
+                author_id=author_id,
+                name=f'{self.rng.choice(DISHES)} №{number}',
+                text='Сгенерированный рецепт.',
+                image='recipe/images/dataset.png',
+                cooking_time=self.rng.randint(5, 180),
+            )
+            for number, author_id in enumerate(self.rng.choices(
+                authors, cum_weights=authors_weights, k=count
+            ))
+        ))
+
+        recipes = list(Recipe.objects.filter(
+            author__in=authors
+        ).order_by('id').values_list('id', flat=True))
+
+        # pub_date заполняется auto_now_add, даты распределяются по году
+        # отдельным массовым обновлением.
+        now = timezone.now()
+        with transaction.atomic():
+            for batch in batches(recipes, self.batch_size):
+                Recipe.objects.bulk_update(
+                    [
+                        Recipe(id=recipe_id, pub_date=now - timezone.timedelta(
+                            seconds=self.rng.randrange(
+                                PUB_DATE_SPREAD_DAYS * 24 * 3600
+                            )
+                        ))
+                        for recipe_id in batch
+                    ],
+                    ['pub_date']
+                )
+
+        ingredients_weights = zipf_cum_weights(
+            len(ingredients), self.exponent
+        )
+        tags_weights = zipf_cum_weights(len(tags), self.exponent)
+
+        def recipe_ingredients():
+            for recipe_id in recipes:
+                chosen = dict(self.rng.choices(
+                    ingredients,
+                    cum_weights=ingredients_weights,
+                    k=self.rng.randint(3, 15)
+                ))
+                for ingredient_id, measurement_unit in chosen.items():
+                    yield RecipeIngredient(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=(
+                            self.rng.choice(GRAMS)
+                            if measurement_unit in ('г', 'мл')
+                            else self.rng.randint(1, 5)
+                        )
+                    )
+
+        def recipe_tags():
+            for recipe_id in recipes:
+                for tag_id in set(self.rng.choices(
+                    tags, cum_weights=tags_weights, k=self.rng.randint(1, 3)
+                )):
+                    yield Recipe.tags.through(
+                        recipe_id=recipe_id, tag_id=tag_id
+                    )
+
+        self.stage('Ингредиенты рецептов', self.insert,
+                   RecipeIngredient, recipe_ingredients())
+        self.stage('Теги рецептов', self.insert,
+                   Recipe.tags.through, recipe_tags())
+        self.rng.shuffle(recipes)
+
+        return recipes
+
+    def create_pairs(self, model, fields, left, right, count, **options):
+        pairs = sample_pairs(
+            self.rng, left, right, count, self.exponent, **options
+        )
+
+        return self.insert(model, (
+            model(**dict(zip(fields, pair))) for pair in pairs
+        ))
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            '########## START GENERATE DATASET ##########'
+        ))
+        ingredients = list(Ingredient.objects.order_by('id').values_list(
+            'id', 'measurement_unit'
+        ))
+        tags = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        if not ingredients or not tags:
+            raise CommandError(
+                'Каталог пуст, сначала выполните loadingredientstags.'
+            )
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]} уже есть, '
+                'укажите другой --prefix.'
+            )
+
+        self.rng = random.Random(options['seed'])
+        self.exponent = options['exponent']
+        self.batch_size = options['batch_size']
+        self.rng.shuffle(ingredients)
+        self.rng.shuffle(tags)
+        start = time.perf_counter()
+
+        users = self.stage(
+            'Пользователи', self.create_users,
+            options['users'], options['prefix'], options['password']
+        )
+        recipes = self.stage(
+            'Рецепты', self.create_recipes,
+            options['recipes'], users, ingredients, tags
+        )
+        self.stage(
+            'Подписки', self.create_pairs,
+            Follow, ['user_id', 'author_id'], users, users,
+            options['follows'], exclude_same=True
+        )
+        self.stage(
+            'Избранное', self.create_pairs,
+            Favorites, ['user_id', 'recipe_id'], users, recipes,
+            options['favorites']
+        )
+        self.stage(
+            'Корзины', self.create_pairs,
+            ShoppingCart, ['user_id', 'recipe_id'], users, recipes,
+            options['carts']
+        )
+
+        # Массовая вставка не отправляет сигналы, производные таблицы
+        # пересчитываются, а кеш рецептов сбрасывается явно.
+        call_command('repairauthorstats', stdout=self.stdout)
+        call_command('rebuildcarttotals', stdout=self.stdout)
+        bump_version(CACHE_PREFIX)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - start:.2f} с'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            '############# FINISH GENERATE #############'
+        ))
@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from recipes.images import generate_variants, mark_variants_ready
+from recipes.loaders import batches
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate missing recipe image variants (thumbnails, WebP) '
+        'and mark recipes whose variants are ready.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Number of worker processes.'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate all variants.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            '########## START GENERATE IMAGE VARIANTS ##########'
+        ))
+        recipes = Recipe.objects.exclude(image='')
+        if not options['force']:
+            recipes = recipes.filter(image_variants_ready=False)
+        names = list(recipes.values_list('image', flat=True).distinct())
+        ready = []
+        created = 0
+        errors = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [
+                pool.submit(generate_variants, name, options['force'])
+                for name in names
+            ]
+            for name, future in tqdm(
+                zip(names, futures),
+                total=len(names),
+                desc='Процесс создания вариантов:',
+                ncols=100,
+                unit=' images'
+            ):
+                try:
+                    created += future.result()
+                except Exception as e:
+                    errors += 1
+                    self.stdout.write(self.style.ERROR(f'{name}: {e}'))
+                else:
+                    ready.append(name)
+
+        # Флаг ставится в основном процессе: рабочие процессы только
+        # пишут файлы и не используют соединение с базой.
+        marked = sum(
+            mark_variants_ready(batch) for batch in batches(ready, 1_000)
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {len(names)}, создано файлов: {created}, '
+            f'отмечено рецептов: {marked}, ошибок: {errors}'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            '################# FINISH GENERATE #################'
+        ))
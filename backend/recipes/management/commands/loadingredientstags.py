@@ -1,57 +1,152 @@
-import csv
 import os
+import time
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
 from tqdm import tqdm
 
-from recipes.models import Ingredient, Tag
+from api.cache import CACHE_PREFIX, bump_version
+from recipes.loaders import batches, read_rows
+from recipes.models import Ingredient, Recipe, Tag
+
+INGREDIENT_FIELDS = ['name', 'measurement_unit']
+TAG_FIELDS = ['name', 'color', 'slug']
 
 
 class Command(BaseCommand):
-    help = 'Load model Ingredinets in DB (.csv).'
+    help = 'Load model Ingredinets and Tags in DB (.csv or .json).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='Ingredients file (.csv or .json).'
+        )
+        parser.add_argument(
+            '--tags',
+            default=os.path.join(settings.BASE_DIR, 'data', 'tags.csv'),
+            help='Tags file (.csv or .json).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows in one INSERT ... ON CONFLICT statement.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the difference with the database without saving.'
+        )
+
+    def print_diff(self, ingredients, tags):
+        existing_ingredients = set(
+            Ingredient.objects.values_list(*INGREDIENT_FIELDS)
+        )
+        new_ingredients = [
+            row for row in ingredients if row not in existing_ingredients
+        ]
+        for name, measurement_unit in new_ingredients:
+            self.stdout.write(f'+ ингредиент {name}, {measurement_unit}')
+
+        existing_tags = {
+            row[2]: row for row in Tag.objects.values_list(*TAG_FIELDS)
+        }
+        new_tags = 0
+        changed_tags = 0
+        for row in tags:
+            current = existing_tags.get(row[2])
+            if current is None:
+                new_tags += 1
+                self.stdout.write(f'+ тег {", ".join(row)}')
+            elif current != row:
+                changed_tags += 1
+                self.stdout.write(
+                    f'~ тег {", ".join(current)} -> {", ".join(row)}'
+                )
 
-    def handle(self, *args, **kwargs):
+        self.stdout.write(
+            f'Ингредиентов: новых {len(new_ingredients)}, '
+            f'без изменений {len(ingredients) - len(new_ingredients)}\n'
+            f'Тегов: новых {new_tags}, измененных {changed_tags}, '
+            f'без изменений {len(tags) - new_tags - changed_tags}'
+        )
+
+    def upsert(self, model, rows, fields, batch_size, desc,
+               **conflict_options):
+        for batch in tqdm(
+            list(batches(rows, batch_size)),
+            desc=desc,
+            ncols=100,
+            unit=' batches'
+        ):
+            model.objects.bulk_create(
+                [model(**dict(zip(fields, row))) for row in batch],
+                update_conflicts=True,
+                **conflict_options
+            )
+
+    def save(self, ingredients, tags, batch_size):
+        existing_tags = {
+            slug: (name, color)
+            for name, color, slug in Tag.objects.values_list(*TAG_FIELDS)
+        }
+        changed_tags = [
+            slug for name, color, slug in tags
+            if existing_tags.get(slug, (name, color)) != (name, color)
+        ]
+        with transaction.atomic():
+            # Конфликт по unique_name_measurement_unit: строка уже есть.
+            self.upsert(
+                Ingredient, ingredients, INGREDIENT_FIELDS, batch_size,
+                desc='Процесс загрузки ингредиентов:',
+                unique_fields=INGREDIENT_FIELDS,
+                update_fields=['measurement_unit']
+            )
+            self.upsert(
+                Tag, tags, TAG_FIELDS, batch_size,
+                desc='Процесс загрузки тегов:',
+                unique_fields=['slug'],
+                update_fields=['name', 'color']
+            )
+            Recipe.objects.filter(tags__slug__in=changed_tags).update(
+                updated_at=timezone.now()
+            )
+
+        # Массовая вставка не отправляет сигналы, версии каталогов и
+        # кеша рецептов увеличиваются явно.
+        for name in ('ingredients', 'tags', CACHE_PREFIX):
+            bump_version(name)
+
+    def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS(
             '######## START LOAD INGREDIENTS & TAGS ########'
         ))
-        csv_ingredients = os.path.join(
-            settings.BASE_DIR, 'data', 'ingredients.csv'
-        )
-        csv_tags = os.path.join(
-            settings.BASE_DIR, 'data', 'tags.csv'
-        )
         try:
-            with open(file=csv_ingredients, mode='r', encoding='utf-8') as f:
-                rows = csv.reader(f)
-                for row in tqdm(
-                    rows,
-                    desc='Процесс загрузки ингредиентов:',
-                    ncols=100,
-                    unit=' ingredients'
-                ):
-                    Ingredient.objects.get_or_create(
-                        name=row[0],
-                        measurement_unit=row[1]
-                    )
-            with open(file=csv_tags, mode='r', encoding='utf-8') as f_tags:
-                rows = csv.reader(f_tags)
-                for row in tqdm(
-                    rows,
-                    desc='Процесс загрузки тегов:',
-                    ncols=100,
-                    unit=' tags'
-                ):
-                    Tag.objects.get_or_create(
-                        name=row[0],
-                        color=row[1],
-                        slug=row[2]
-                    )
+            start = time.perf_counter()
+            ingredients = read_rows(options['ingredients'], INGREDIENT_FIELDS)
+            tags = read_rows(options['tags'], TAG_FIELDS)
+            read_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if options['dry_run']:
+                self.print_diff(ingredients, tags)
+            else:
+                self.save(ingredients, tags, options['batch_size'])
+            write_time = time.perf_counter() - start
         except FileNotFoundError as e:
-            self.stdout.write(self.style.ERROR(f'Файл CSV не найден: {e}'))
+            self.stdout.write(self.style.ERROR(f'Файл не найден: {e}'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Что-то пошло не так: {e}'))
         else:
+            self.stdout.write(
+                f'Строк: ингредиентов {len(ingredients)}, тегов {len(tags)}\n'
+                f'Время: чтение {read_time:.2f} с, '
+                f'{"сравнение" if options["dry_run"] else "запись"} '
+                f'{write_time:.2f} с'
+            )
             self.stdout.write(self.style.SUCCESS(
                 '=================== SUCCESS ==================='
             ))
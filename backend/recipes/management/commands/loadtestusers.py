@@ -1,44 +1,127 @@
-import csv
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from tqdm import tqdm
 
+from recipes.author_stats import create_missing_author_stats
+from recipes.loaders import batches, read_rows
 from users.models import User
 
+USER_FIELDS = ['username', 'password', 'first_name', 'last_name', 'email']
+UPDATE_FIELDS = ['username', 'password', 'first_name', 'last_name']
+
 
 class Command(BaseCommand):
-    help = 'Load 3 test users in DB (.csv).'
+    help = 'Load test users in DB (.csv or .json).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            default=os.path.join(settings.BASE_DIR, 'data', 'users.csv'),
+            help='Users file (.csv or .json).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows in one INSERT ... ON CONFLICT statement.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Number of threads hashing passwords.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the difference with the database without saving.'
+        )
+
+    def print_diff(self, rows):
+        existing = {
+            row[-1]: row
+            for row in User.objects.values_list(
+                'username', 'first_name', 'last_name', 'email'
+            )
+        }
+        new = 0
+        changed = 0
+        for username, _, first_name, last_name, email in rows:
+            row = (username, first_name, last_name, email)
+            current = existing.get(email)
+            if current is None:
+                new += 1
+                self.stdout.write(f'+ пользователь {", ".join(row)}')
+            elif current != row:
+                changed += 1
+                self.stdout.write(
+                    f'~ пользователь {", ".join(current)} -> {", ".join(row)}'
+                )
 
-    def handle(self, *args, **kwargs):
+        self.stdout.write(
+            f'Пользователей: новых {new}, измененных {changed}, '
+            f'без изменений {len(rows) - new - changed}'
+        )
+
+    def save(self, rows, batch_size, workers):
+        # PBKDF2 в hashlib освобождает GIL, пароли хешируются параллельно.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            passwords = list(tqdm(
+                pool.map(make_password, [row[1] for row in rows]),
+                total=len(rows),
+                desc='Процесс хеширования паролей:',
+                ncols=100,
+                unit=' users'
+            ))
+
+        users = [
+            User(**{**dict(zip(USER_FIELDS, row)), 'password': password})
+            for row, password in zip(rows, passwords)
+        ]
+        with transaction.atomic():
+            for batch in batches(users, batch_size):
+                User.objects.bulk_create(
+                    batch,
+                    update_conflicts=True,
+                    unique_fields=['email'],
+                    update_fields=UPDATE_FIELDS
+                )
+            # Массовая вставка не отправляет post_save, записи статистики
+            # новых пользователей создаются явно.
+            create_missing_author_stats(User.objects.all())
+
+    def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS(
             '############### START LOAD USER ###############'
         ))
-        csv_users = os.path.join(
-            settings.BASE_DIR, 'data', 'users.csv'
-        )
         try:
-            with open(file=csv_users, mode='r', encoding='utf-8') as f:
-                rows = csv.reader(f)
-                for row in tqdm(
-                    rows,
-                    desc='Процесс загрузки тестовых пользователей:',
-                    ncols=100,
-                    unit=' users'
-                ):
-                    User.objects.get_or_create(
-                        username=row[0],
-                        password=row[1],
-                        first_name=row[2],
-                        last_name=row[3],
-                        email=row[4]
-                    )
+            start = time.perf_counter()
+            rows = read_rows(options['users'], USER_FIELDS)
+            read_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if options['dry_run']:
+                self.print_diff(rows)
+            else:
+                self.save(rows, options['batch_size'], options['workers'])
+            write_time = time.perf_counter() - start
         except FileNotFoundError as e:
-            self.stdout.write(self.style.ERROR(f'Файл CSV не найден: {e}'))
+            self.stdout.write(self.style.ERROR(f'Файл не найден: {e}'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Что-то пошло не так: {e}'))
         else:
+            self.stdout.write(
+                f'Пользователей: {len(rows)}\n'
+                f'Время: чтение {read_time:.2f} с, '
+                f'{"сравнение" if options["dry_run"] else "запись"} '
+                f'{write_time:.2f} с'
+            )
             self.stdout.write(self.style.SUCCESS(
                 '=================== SUCCESS ==================='
             ))
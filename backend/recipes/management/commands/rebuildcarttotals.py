@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from recipes.cart_totals import refresh_cart_totals
+from recipes.models import ShoppingCart, ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-user shopping cart ingredient totals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users rebuilt in one transaction.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            '########## START REBUILD CART TOTALS ##########'
+        ))
+        users = list(ShoppingCart.objects.values_list(
+            'user', flat=True
+        ).distinct().order_by('user'))
+        ShoppingCartIngredient.objects.exclude(user__in=users).delete()
+
+        batch_size = options['batch_size']
+        for start in tqdm(
+            range(0, len(users), batch_size),
+            desc='Процесс пересчета корзин:',
+            ncols=100,
+            unit=' batches'
+        ):
+            refresh_cart_totals(
+                users[start:start + batch_size], batch_size=1000
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано корзин: {len(users)}'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            '################ FINISH REBUILD ################'
+        ))
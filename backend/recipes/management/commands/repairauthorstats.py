@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from recipes.author_stats import refresh_author_stats
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Recompute author statistics (recipes, followers, favorites).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of authors recomputed per chunk.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            '########## START REPAIR AUTHOR STATS ##########'
+        ))
+        batch_size = options['batch_size']
+        authors = User.objects.order_by('pk').values_list('pk', flat=True)
+        total = authors.count()
+        changed = 0
+        last_pk = 0
+
+        with tqdm(
+            total=total,
+            desc='Процесс пересчета статистики:',
+            ncols=100,
+            unit=' authors'
+        ) as progress:
+            while True:
+                chunk = list(authors.filter(pk__gt=last_pk)[:batch_size])
+                if not chunk:
+                    break
+                changed += refresh_author_stats(chunk)
+                last_pk = chunk[-1]
+                progress.update(len(chunk))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов: {total}, исправлено записей: {changed}'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            '################ FINISH REPAIR ################'
+        ))
@@ -0,0 +1,80 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models.functions import Upper
+
+SQLITE_FTS_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts "
+    "USING fts5(name, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO recipes_recipe_fts(rowid, name) "
+    "SELECT id, replace(replace(name, 'ё', 'е'), 'Ё', 'Е') "
+    "FROM recipes_recipe",
+    "CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert "
+    "AFTER INSERT ON recipes_recipe BEGIN "
+    "INSERT INTO recipes_recipe_fts(rowid, name) VALUES "
+    "(new.id, replace(replace(new.name, 'ё', 'е'), 'Ё', 'Е')); END",
+    "CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete "
+    "AFTER DELETE ON recipes_recipe BEGIN "
+    "DELETE FROM recipes_recipe_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update "
+    "AFTER UPDATE OF name ON recipes_recipe BEGIN "
+    "UPDATE recipes_recipe_fts "
+    "SET name = replace(replace(new.name, 'ё', 'е'), 'Ё', 'Е') "
+    "WHERE rowid = new.id; END",
+]
+SQLITE_FTS_BACKWARD = [
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+]
+
+
+def get_postgres_indexes():
+    return [
+        GinIndex(
+            SearchVector('name', config='russian'),
+            name='recipe_name_search_idx'
+        ),
+        GinIndex(
+            OpClass(Upper('name'), name='gin_trgm_ops'),
+            name='recipe_name_trgm_idx'
+        ),
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    Recipe = apps.get_model('recipes', 'Recipe')
+
+    if vendor == 'postgresql':
+        for index in get_postgres_indexes():
+            schema_editor.add_index(Recipe, index)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FTS_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    Recipe = apps.get_model('recipes', 'Recipe')
+
+    if vendor == 'postgresql':
+        for index in get_postgres_indexes():
+            schema_editor.remove_index(Recipe, index)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FTS_BACKWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_updated_at'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
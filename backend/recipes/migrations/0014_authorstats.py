@@ -0,0 +1,64 @@
+# Generated by Django 4.2.6 on 2026-10-17 04:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_author_stats(apps, schema_editor):
+    AuthorStats = apps.get_model('recipes', 'AuthorStats')
+    Favorites = apps.get_model('recipes', 'Favorites')
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+
+    def count_by_author(queryset, author_field):
+        return dict(
+            queryset.values(author_field).annotate(
+                total=models.Count('pk')
+            ).order_by().values_list(author_field, 'total')
+        )
+
+    recipes = count_by_author(Recipe.objects.all(), 'author')
+    followers = count_by_author(Follow.objects.all(), 'author')
+    favorites = count_by_author(Favorites.objects.all(), 'recipe__author')
+    AuthorStats.objects.bulk_create(
+        (
+            AuthorStats(
+                author_id=author_id,
+                recipes_count=recipes.get(author_id, 0),
+                followers_count=followers.get(author_id, 0),
+                favorites_count=favorites.get(author_id, 0),
+            )
+            for author_id in User.objects.filter(
+                models.Q(recipes__isnull=False)
+                | models.Q(following__isnull=False)
+            ).distinct().values_list('pk', flat=True).iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0013_shoppingcartingredient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Количество рецептов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Количество подписчиков')),
+                ('favorites_count', models.PositiveIntegerField(default=0, verbose_name='Количество добавлений в избранное')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
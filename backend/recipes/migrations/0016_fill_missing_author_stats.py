@@ -0,0 +1,35 @@
+# Generated by Django 4.2.6 on 2026-10-17 12:10
+
+from django.db import migrations
+
+
+def fill_missing_author_stats(apps, schema_editor):
+    AuthorStats = apps.get_model('recipes', 'AuthorStats')
+    User = apps.get_model('users', 'User')
+
+    # Записи уже есть у всех авторов и пользователей с подписчиками,
+    # у остальных все счетчики нулевые.
+    AuthorStats.objects.bulk_create(
+        (
+            AuthorStats(author_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True).iterator()
+        ),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0015_recipe_image_variants_ready'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_missing_author_stats, migrations.RunPython.noop
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.core.validators import (MaxValueValidator,
                                     MinValueValidator,
                                     RegexValidator)
 from django.db import models
+from django.db.models.functions import RowNumber
 
 from users.models import User
 
@@ -81,6 +82,44 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Запросы рецептов со связанными объектами для чтения."""
+
+    def related_lookups(self):
+        return [
+            'tags',
+            models.Prefetch(
+                'ingredient',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        ]
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            *self.related_lookups()
+        )
+
+    def latest_per_author(self, limit=None):
+        """Последние limit рецептов каждого автора одним запросом.
+
+        Номер рецепта внутри автора считается оконной функцией
+        ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY pub_date DESC).
+        """
+        ordering = [models.F('pub_date').desc(), models.F('id').desc()]
+        queryset = self.order_by(*ordering)
+
+        if limit is None:
+            return queryset
+
+        return queryset.annotate(
+            author_row_number=models.Window(
+                RowNumber(),
+                partition_by=models.F('author'),
+                order_by=ordering
+            )
+        ).filter(author_row_number__lte=limit)
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
 
@@ -113,6 +152,11 @@ class Recipe(models.Model):
         verbose_name='Ссылка на картинку на сайте',
         help_text='Загрузите картинку'
     )
+    image_variants_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Варианты картинки созданы'
+    )
     text = models.TextField(
         verbose_name='Описание',
         help_text='Опишите рецепт приготовления'
@@ -132,9 +176,22 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            )
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('name', 'author'),
@@ -150,6 +207,29 @@ class Recipe(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in instance.__dict__:
+            instance._loaded_image = instance.__dict__['image']
+
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Варианты созданы для прежней картинки: новая до их генерации
+        # отдается ссылками на оригинал.
+        loaded_image = self.__dict__.get('_loaded_image')
+        if loaded_image is not None and self.image.name != loaded_image:
+            self.image_variants_ready = False
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'image' in update_fields:
+                kwargs['update_fields'] = {
+                    *update_fields, 'image_variants_ready'
+                }
+
+        super().save(*args, **kwargs)
+        self._loaded_image = self.image.name
+
 
 class RecipeIngredient(models.Model):
     """Связующая таблица между Recipe и Ingridient."""
@@ -252,3 +332,73 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
+
+
+class ShoppingCartIngredient(models.Model):
+    """Суммарное количество ингредиента в корзине пользователя.
+
+    Таблица поддерживается сигналами при изменении корзины и состава
+    рецептов и позволяет выгружать список покупок без агрегации.
+    """
+
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        to=Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_cart_ingredient_user'
+            )
+        ]
+        verbose_name = 'Ингредиенты в корзине'
+        verbose_name_plural = 'Ингредиенты в корзине'
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient} {self.amount}'
+
+
+class AuthorStats(models.Model):
+    """Счетчики автора: рецепты, подписчики и добавления в избранное.
+
+    Поддерживаются сигналами через F()-выражения и пересчитываются
+    командой repairauthorstats.
+    """
+
+    author = models.OneToOneField(
+        to=User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество добавлений в избранное'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'{self.author_id} {self.recipes_count} {self.followers_count}'
@@ -0,0 +1,65 @@
+from django.db import transaction
+
+FTS_TABLE = 'recipes_recipe_fts'
+RECIPE_TABLE = 'recipes_recipe'
+
+
+def normalize(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+FTS_TRIGGERS = {
+    'recipes_recipe_fts_insert': (
+        f'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert '
+        f'AFTER INSERT ON {RECIPE_TABLE} BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, name) VALUES '
+        f'(new.id, {normalize("new.name")}); END'
+    ),
+    'recipes_recipe_fts_delete': (
+        f'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete '
+        f'AFTER DELETE ON {RECIPE_TABLE} BEGIN '
+        f'DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END'
+    ),
+    'recipes_recipe_fts_update': (
+        f'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update '
+        f'AFTER UPDATE OF name ON {RECIPE_TABLE} BEGIN '
+        f'UPDATE {FTS_TABLE} SET name = {normalize("new.name")} '
+        f'WHERE rowid = new.id; END'
+    ),
+}
+
+
+def ensure_sqlite_fts(connection):
+    """Триггеры индекса FTS5 названий рецептов на SQLite.
+
+    Изменение схемы recipes_recipe на SQLite пересоздает таблицу и
+    удаляет ее триггеры, после чего индекс перестает обновляться.
+    Недостающие триггеры создаются заново, а индекс перестраивается
+    целиком; при целых триггерах вызов ничего не меняет.
+    """
+    if connection.vendor != 'sqlite':
+        return
+
+    tables = connection.introspection.table_names()
+    if FTS_TABLE not in tables or RECIPE_TABLE not in tables:
+        return
+
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'trigger' AND tbl_name = %s",
+                [RECIPE_TABLE]
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in FTS_TRIGGERS if name not in existing]
+            if not missing:
+                return
+
+            for name in missing:
+                cursor.execute(FTS_TRIGGERS[name])
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, name) '
+                f'SELECT id, {normalize("name")} FROM {RECIPE_TABLE}'
+            )
@@ -0,0 +1,218 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed,
+                                      post_delete,
+                                      post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes.author_stats import change_author_stats
+from recipes.cart_totals import (refresh_cart_totals,
+                                 refresh_recipe_cart_totals)
+from recipes.images import schedule_variants
+from recipes.models import (AuthorStats,
+                            Favorites,
+                            Ingredient,
+                            Recipe,
+                            RecipeIngredient,
+                            ShoppingCart,
+                            Tag)
+from users.models import Follow, User
+
+
+cascade = threading.local()
+
+
+def is_recipe_deferred(recipe_id):
+    """Сигналы строк рецепта отложены.
+
+    Так бывает, когда рецепт удаляется вместе со связанными строками или
+    изменяется сериализатором. Сигналы строк ингредиентов, тегов, корзин
+    и избранного в этом случае пропускаются: производные данные, дата
+    изменения и статистика автора обновляются один раз.
+    """
+    return (
+        recipe_id in getattr(cascade, 'recipes', {})
+        or recipe_id in getattr(cascade, 'updated', set())
+    )
+
+
+@contextmanager
+def defer_recipe_signals(recipe_id):
+    """Пропуск сигналов строк рецепта на время его изменения.
+
+    Вызывающий код сам пересчитывает корзины и сохраняет updated_at.
+    """
+    if not hasattr(cascade, 'updated'):
+        cascade.updated = set()
+    cascade.updated.add(recipe_id)
+    try:
+        yield
+    finally:
+        cascade.updated.discard(recipe_id)
+
+
+def touch_recipes(queryset):
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def touch_recipe_on_ingredients_change(sender, instance, **kwargs):
+    if not is_recipe_deferred(instance.recipe_id):
+        touch_recipes(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_on_tags_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    if reverse and action in ('pre_clear', 'post_add', 'post_remove'):
+        touch_recipes(
+            instance.recipes.all() if action == 'pre_clear'
+            else Recipe.objects.filter(pk__in=pk_set)
+        )
+    elif (
+        not reverse
+        and action in ('post_add', 'post_remove', 'post_clear')
+        and not is_recipe_deferred(instance.pk)
+    ):
+        touch_recipes(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Tag)
+def touch_recipes_on_tag_change(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def touch_recipes_on_tag_delete(sender, instance, **kwargs):
+    # Связи с рецептами удаляются каскадом без сигналов m2m_changed.
+    touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_on_ingredient_change(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=Recipe)
+def create_image_variants(sender, instance, **kwargs):
+    if instance.image and not instance.image_variants_ready:
+        name = instance.image.name
+        transaction.on_commit(lambda: schedule_variants(name))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_cart_totals_on_ingredients_change(sender, instance,
+                                              created=True, **kwargs):
+    if is_recipe_deferred(instance.recipe_id):
+        return
+
+    if created:
+        refresh_recipe_cart_totals(
+            instance.recipe_id, [instance.ingredient_id]
+        )
+    else:
+        # Ингредиент строки мог смениться, корзины пересчитываются целиком.
+        refresh_cart_totals(ShoppingCart.objects.filter(
+            recipe=instance.recipe_id
+        ).values_list('user', flat=True))
+
+
+def get_recipe_ingredients(recipe_id):
+    return list(RecipeIngredient.objects.filter(
+        recipe=recipe_id
+    ).values_list('ingredient', flat=True))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        refresh_cart_totals(
+            [instance.user_id], get_recipe_ingredients(instance.recipe_id)
+        )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_recipe_from_cart_totals(sender, instance, **kwargs):
+    if not is_recipe_deferred(instance.recipe_id):
+        refresh_cart_totals(
+            [instance.user_id], get_recipe_ingredients(instance.recipe_id)
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def start_recipe_deletion(sender, instance, **kwargs):
+    # pre_delete рецепта приходит до удаления любых связанных строк,
+    # поэтому затронутые корзины, состав и избранное еще можно прочитать.
+    if not hasattr(cascade, 'recipes'):
+        cascade.recipes = {}
+    cascade.recipes[instance.pk] = {
+        'users': list(ShoppingCart.objects.filter(
+            recipe=instance
+        ).values_list('user', flat=True)),
+        'ingredients': get_recipe_ingredients(instance.pk),
+        'favorites': Favorites.objects.filter(recipe=instance).count(),
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def finish_recipe_deletion(sender, instance, **kwargs):
+    deleted = getattr(cascade, 'recipes', {}).pop(instance.pk, None)
+    if deleted is None:
+        return
+
+    if deleted['users']:
+        refresh_cart_totals(deleted['users'], deleted['ingredients'])
+
+    AuthorStats.objects.filter(author=instance.author_id).update(
+        recipes_count=F('recipes_count') - 1,
+        favorites_count=F('favorites_count') - deleted['favorites']
+    )
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.create(author=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_author_recipes(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Follow)
+def increment_author_followers(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_author_followers(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Favorites)
+def increment_author_favorites(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(
+            instance.recipe.author_id, 'favorites_count', 1
+        )
+
+
+@receiver(post_delete, sender=Favorites)
+def decrement_author_favorites(sender, instance, **kwargs):
+    # Автор определяется подзапросом без загрузки рецепта.
+    if not is_recipe_deferred(instance.recipe_id):
+        AuthorStats.objects.filter(
+            author__recipes=instance.recipe_id
+        ).update(favorites_count=F('favorites_count') - 1)